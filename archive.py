@@ -0,0 +1,190 @@
+"""
+Compact binary encodings for ChessVar positions and games.
+
+A position is a fixed POSITION_SIZE bytes: 32 bytes holding a 4 bit code for each square (0 for empty, type code + 1
+for white, type code + 9 for black, the even square in the low nibble), one byte for the color code of the player to
+move, one for the game state and twelve for the count dicts, white's then black's in type code order. Since every
+position is the same size, a file of them is read at random by index with read_position().
+
+A move is two bytes, source * 64 + target using row * 8 + col square indexes, stored little endian.
+
+A game archive holds games back to back followed by an index of where each game starts, so ArchiveReader can mmap
+the file and decode any single game by its index without reading the rest:
+
+    header:  b"CVGA", format version (uint16), reserved (uint16)
+    game:    game state (uint8), reserved (uint8), move count (uint16), then two bytes per move
+    index:   the offset of each game (uint64)
+    trailer: index offset (uint64), game count (uint64), b"CVGA"
+"""
+import mmap
+import struct
+
+from game import ChessVar
+from piece import WHITE, PIECE_TYPES
+from records import GameRecord
+from squares import SQUARE_INDEX, SQUARE_NAMES
+from subpieces import PIECES
+
+MAGIC = b"CVGA"
+VERSION = 1
+POSITION_SIZE = 46
+GAME_STATES = ("UNFINISHED", "WHITE_WON", "BLACK_WON")
+STATE_CODES = {state: code for code, state in enumerate(GAME_STATES)}
+
+_HEADER = struct.Struct("<4sHH")
+_GAME_HEADER = struct.Struct("<BBH")
+_TRAILER = struct.Struct("<QQ4s")
+_OFFSET = struct.Struct("<Q")
+_COUNTS = struct.Struct("<12B")
+
+
+def encode_position(game):
+    """Returns the POSITION_SIZE byte encoding of a ChessVar's current position"""
+    data = bytearray(POSITION_SIZE)
+    for square in range(64):
+        piece = game.get_piece(square >> 3, square & 7)
+        if piece is not None:
+            code = piece.type_code + 1 if piece.color_code == WHITE else piece.type_code + 9
+            data[square >> 1] |= code << 4 * (square & 1)
+    data[32] = 0 if game.get_turn() == "WHITE" else 1
+    data[33] = STATE_CODES[game.get_game_state()]
+    counts = [game.get_white_count()[name] for name in PIECE_TYPES]
+    counts.extend(game.get_black_count()[name] for name in PIECE_TYPES)
+    _COUNTS.pack_into(data, 34, *counts)
+    return bytes(data)
+
+
+def decode_position(data, backend="list"):
+    """Builds a new ChessVar using backend from the POSITION_SIZE bytes of an encoded position"""
+    board = [[None] * 8 for _ in range(8)]
+    for square in range(64):
+        code = data[square >> 1] >> 4 * (square & 1) & 15
+        if code:
+            board[square >> 3][square & 7] = PIECES[code >> 3][(code & 7) - 1]
+    counts = _COUNTS.unpack_from(data, 34)
+    game = ChessVar(backend)
+    game.set_position(board, "WHITE" if data[32] == 0 else "BLACK", dict(zip(PIECE_TYPES, counts[:6])),
+                      dict(zip(PIECE_TYPES, counts[6:])), GAME_STATES[data[33]])
+    return game
+
+
+def read_position(buffer, index, backend="list"):
+    """Decodes the position at index from a bytes-like buffer of back to back encoded positions, such as an mmap"""
+    start = index * POSITION_SIZE
+    return decode_position(buffer[start:start + POSITION_SIZE], backend)
+
+
+def encode_moves(moves):
+    """Returns the two bytes per move encoding of a list of (source, target) chess notation pairs"""
+    values = [SQUARE_INDEX[source] << 6 | SQUARE_INDEX[target] for source, target in moves]
+    return struct.pack("<%dH" % len(values), *values)
+
+
+def decode_moves(data):
+    """Returns the list of (source, target) chess notation pairs encoded in data"""
+    values = struct.unpack("<%dH" % (len(data) // 2), data)
+    return [(SQUARE_NAMES[value >> 6], SQUARE_NAMES[value & 63]) for value in values]
+
+
+class ArchiveWriter:
+    """
+    Writes games to a binary archive file one at a time. close() writes the index, so it must be called (or the writer
+    used in a with statement) for the archive to be readable. Contains two data members:
+    * file: the binary file object being written
+    * offsets: the starting offset of every game written so far
+    """
+    def __init__(self, file):
+        self._file = file
+        self._offsets = []
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_game(self, moves, result):
+        """Writes one game given its (source, target) moves and the game state it ended in"""
+        if len(moves) > 0xFFFF:
+            raise ValueError("games of more than 65535 moves can't be archived")
+        self._offsets.append(self._file.tell())
+        self._file.write(_GAME_HEADER.pack(STATE_CODES[result], 0, len(moves)))
+        self._file.write(encode_moves(moves))
+
+    def write_chessvar(self, game):
+        """Writes the moves played so far in a ChessVar along with its current game state"""
+        self.write_game(game.get_moves(), game.get_game_state())
+
+    def close(self):
+        """Writes the index and trailer after the last game"""
+        index_offset = self._file.tell()
+        for offset in self._offsets:
+            self._file.write(_OFFSET.pack(offset))
+        self._file.write(_TRAILER.pack(index_offset, len(self._offsets), MAGIC))
+        self._file.flush()
+
+
+class ArchiveReader:
+    """
+    Opens a game archive with mmap and decodes single games by index on demand. Contains four data members:
+    * file: the open archive file
+    * map: the read-only mmap of the whole file
+    * index_offset: where the index of game offsets starts
+    * count: the number of games in the archive
+    """
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can't be mapped
+            self._file.close()
+            raise ValueError("not a ChessVar game archive: " + str(path)) from None
+        size = len(self._map)
+        valid = size >= _HEADER.size + _TRAILER.size
+        if valid:
+            magic, version, _ = _HEADER.unpack_from(self._map, 0)
+            self._index_offset, self._count, trailer_magic = _TRAILER.unpack_from(self._map, size - _TRAILER.size)
+            # the index has to fit between the games and the trailer exactly
+            valid = (magic == MAGIC and trailer_magic == MAGIC and version == VERSION and
+                     _HEADER.size <= self._index_offset and
+                     self._index_offset + self._count * _OFFSET.size + _TRAILER.size == size)
+        if not valid:
+            self.close()
+            raise ValueError("not a ChessVar game archive: " + str(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """Returns game index as a GameRecord from records.py"""
+        return GameRecord(self.get_moves(index), self.get_result(index))
+
+    def _game_offset(self, index):
+        """Returns the offset of game index, looked up in the index"""
+        if not 0 <= index < self._count:
+            raise IndexError("game index out of range")
+        return _OFFSET.unpack_from(self._map, self._index_offset + index * _OFFSET.size)[0]
+
+    def get_result(self, index):
+        """Returns the game state game index ended in"""
+        return GAME_STATES[self._map[self._game_offset(index)]]
+
+    def get_moves(self, index):
+        """Returns the (source, target) moves of game index"""
+        offset = self._game_offset(index)
+        move_count = _GAME_HEADER.unpack_from(self._map, offset)[2]
+        start = offset + _GAME_HEADER.size
+        return decode_moves(self._map[start:start + 2 * move_count])
+
+    def close(self):
+        """Unmaps and closes the archive file"""
+        self._map.close()
+        self._file.close()
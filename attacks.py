@@ -0,0 +1,128 @@
+from movegen import KNIGHT_JUMPS, KING_JUMPS, RAY_SQUARES
+from squares import SLIDER_DIRECTIONS
+
+
+def _build_pawn_captures():
+    """Returns PAWN_CAPTURES[color code][square], the squares diagonally forward of a pawn of that color on square"""
+    table = []
+    for step in (-1, 1):
+        captures = []
+        for square in range(64):
+            row, col = divmod(square, 8)
+            captures.append(tuple((row + step) * 8 + col + col_step for col_step in (-1, 1)
+                                  if 0 <= row + step < 8 and 0 <= col + col_step < 8))
+        table.append(tuple(captures))
+    return tuple(table)
+
+
+PAWN_CAPTURES = _build_pawn_captures()
+
+
+def attacked_from(square, piece, piece_at):
+    """
+    Returns the squares the piece on square attacks, meaning the squares it could capture on if an opposing piece
+    stood there. Sliders stop at the first piece on each ray, including it whatever its color.
+    * piece_at: a function taking a row and col and returning the Piece there or None, like ChessVar.get_piece()
+    """
+    kind = piece.type_code
+    if kind == 0:
+        return PAWN_CAPTURES[piece.color_code][square]
+    if kind == 1:
+        return KNIGHT_JUMPS[square]
+    if kind == 5:
+        return KING_JUMPS[square]
+    targets = []
+    for direction in SLIDER_DIRECTIONS[kind]:
+        for target in RAY_SQUARES[direction][square]:
+            targets.append(target)
+            if piece_at(target >> 3, target & 7) is not None:
+                break
+    return tuple(targets)
+
+
+class AttackMap:
+    """
+    Which squares each piece attacks, kept for ChessVar's attack queries. Nothing is worked out until refresh() is
+    called, and after that only the squares a move touched, plus the sliders whose rays ran through them, are redone.
+    Knights, kings and pawns attack the same squares wherever the other pieces are, so only those two kinds of square
+    can change. Contains six data members:
+    * targets: a list of 64 tuples, the squares attacked by the piece on each square, empty for an empty square
+    * attackers: a list of 64 sets, the squares holding the pieces that attack each square
+    * colors, kinds: lists of the color code and type code of the piece on each square, None for an empty square
+    * counts: counts[color code][square] is the number of that color's pieces attacking square
+    * attacked: attacked[color code] is the set of squares at least one of that color's pieces attacks
+    * stale: the set of squares moves have touched since the last refresh(), or None when the whole map needs building
+    """
+    def __init__(self):
+        self._targets = [()] * 64
+        self._attackers = [set() for _ in range(64)]
+        self._colors = [None] * 64
+        self._kinds = [None] * 64
+        self._counts = ([0] * 64, [0] * 64)
+        self._attacked = (set(), set())
+        self._stale = None
+
+    def touch(self, source, target):
+        """Records that a move or take back changed source and target. Cheap, the work waits for refresh()"""
+        if self._stale is not None:
+            self._stale.add(source)
+            self._stale.add(target)
+
+    def reset(self):
+        """Marks the whole map for rebuilding, for when the position is replaced rather than moved"""
+        self._stale = None
+
+    def get_attacked(self, color_code):
+        """Returns the set of squares attacked by color_code's pieces. The set is the map's own, so don't change it"""
+        return self._attacked[color_code]
+
+    def get_attackers(self, square):
+        """Returns the set of squares of the pieces attacking square. The set is the map's own, so don't change it"""
+        return self._attackers[square]
+
+    def refresh(self, piece_at):
+        """Brings the map up to date with the position piece_at() reads from, as cheaply as the touched squares allow"""
+        if self._stale is None:
+            dirty = range(64)
+        elif not self._stale:
+            return
+        else:
+            # a slider whose ray reached a touched square may now see further or less far. the stale map is good
+            # enough to find them: a slider whose ray changed at one move but not an earlier one had the same ray
+            # before the earlier move, and any slider moved by an earlier move is on a touched square already
+            dirty = set(self._stale)
+            for square in self._stale:
+                for attacker in self._attackers[square]:
+                    if SLIDER_DIRECTIONS[self._kinds[attacker]] is not None:
+                        dirty.add(attacker)
+        for square in dirty:
+            self._update_square(square, piece_at(square >> 3, square & 7), piece_at)
+        self._stale = set()
+
+    def _update_square(self, square, piece, piece_at):
+        """Replaces the attacks of whatever was on square with those of piece, which may be None"""
+        color = self._colors[square]
+        if color is not None:
+            counts = self._counts[color]
+            attacked = self._attacked[color]
+            for target in self._targets[square]:
+                self._attackers[target].discard(square)
+                counts[target] -= 1
+                if counts[target] == 0:
+                    attacked.discard(target)
+        if piece is None:
+            self._targets[square] = ()
+            self._colors[square] = None
+            self._kinds[square] = None
+            return
+        color = piece.color_code
+        targets = attacked_from(square, piece, piece_at)
+        counts = self._counts[color]
+        attacked = self._attacked[color]
+        for target in targets:
+            self._attackers[target].add(square)
+            counts[target] += 1
+            attacked.add(target)
+        self._targets[square] = targets
+        self._colors[square] = color
+        self._kinds[square] = piece.type_code
@@ -0,0 +1,94 @@
+"""
+Compares how many moves per second ChessVar plays with each of its board backends. Random games are recorded
+once and then replayed through make_move() on each backend, so every backend does exactly the same work. A second pass
+calls legal_moves() after each move and a third calls validate_move() for every source/target pair, which is what
+finding all legal moves cost before legal_moves() existed.
+
+Run from the repository root with: python benchmarks/bench_backends.py [games] [seed]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import ChessVar, BACKENDS
+
+
+def record_game(rng, max_moves=200):
+    """Plays one random game on the list backend and returns its moves as (source, target) notation pairs"""
+    game = ChessVar()
+    moves = []
+    while game.get_game_state() == "UNFINISHED" and len(moves) < max_moves:
+        legal = game.legal_moves()
+        if not legal:
+            break
+        move = rng.choice(legal)
+        game.make_move(*move)
+        moves.append(move)
+    return moves
+
+
+def replay(backend, games):
+    """Replays every recorded game on a fresh ChessVar using backend and returns the number of moves played"""
+    played = 0
+    for moves in games:
+        game = ChessVar(backend)
+        for source, target in moves:
+            game.make_move(source, target)
+        played += len(moves)
+    return played
+
+
+def validate_all(backend, games):
+    """Replays the recorded games and validates all 4096 source/target pairs after each move, returning the count"""
+    checked = 0
+    for moves in games:
+        game = ChessVar(backend)
+        for source, target in moves:
+            game.make_move(source, target)
+            for source_row in range(8):
+                for source_col in range(8):
+                    for target_row in range(8):
+                        for target_col in range(8):
+                            game.validate_move(None, source_row, source_col, target_row, target_col)
+            checked += 4096
+    return checked
+
+
+def generate_all(backend, games):
+    """Replays the recorded games and calls legal_moves() after each move, returning the number of moves generated"""
+    generated = 0
+    for moves in games:
+        game = ChessVar(backend)
+        for source, target in moves:
+            game.make_move(source, target)
+            generated += len(game.legal_moves())
+    return generated
+
+
+def main(game_count=200, seed=0):
+    rng = random.Random(seed)
+    games = [record_game(rng) for _ in range(game_count)]
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        played = replay(backend, games)
+        elapsed = time.perf_counter() - start
+        print("%-8s %9d moves in %7.3fs  %10.0f moves/s" % (backend, played, elapsed, played / elapsed))
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        generated = generate_all(backend, games)
+        elapsed = time.perf_counter() - start
+        print("%-8s %9d generated in %3.3fs  %10.0f generated/s" % (backend, generated, elapsed, generated / elapsed))
+    # validating every pair is much slower than playing, so only a slice of the games is used
+    sample = games[:max(1, game_count // 20)]
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        checked = validate_all(backend, sample)
+        elapsed = time.perf_counter() - start
+        print("%-8s %9d checks in %6.3fs  %10.0f checks/s" % (backend, checked, elapsed, checked / elapsed))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
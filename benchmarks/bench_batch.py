@@ -0,0 +1,66 @@
+"""
+Compares batch.validate_moves() against calling ChessVar.validate_move() once per move. Positions are sampled from
+random games and every one of the 4096 source/target pairs is checked on each, so the batch results are also
+checked against validate_move() for every pair. Needs NumPy.
+
+Run from the repository root with: python benchmarks/bench_batch.py [--positions N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from batch import encode_boards, validate_moves
+from game import ChessVar
+
+
+def sample_positions(count, seed=0):
+    """Returns count ChessVar games stopped after a random number of random moves"""
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = ChessVar()
+        for _ in range(rng.randrange(60)):
+            moves = game.legal_moves()
+            if game.get_game_state() != "UNFINISHED" or not moves:
+                break
+            game.make_move(*rng.choice(moves))
+        games.append(game)
+    return games
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare batched and per move validation")
+    parser.add_argument("--positions", type=int, default=50, help="number of positions to sample")
+    args = parser.parse_args(argv)
+    games = sample_positions(args.positions)
+
+    # one row per (position, source, target)
+    boards, turns = encode_boards(games)
+    repeat = np.repeat(np.arange(len(games)), 4096)
+    sources = np.tile(np.repeat(np.arange(64), 64), len(games))
+    targets = np.tile(np.tile(np.arange(64), 64), len(games))
+    unfinished = np.array([game.get_game_state() == "UNFINISHED" for game in games])
+
+    start = time.perf_counter()
+    expected = [game.validate_move(None, source >> 3, source & 7, target >> 3, target & 7)
+                for game in games for source in range(64) for target in range(64)]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = validate_moves(boards[repeat], sources, targets, turns[repeat], unfinished[repeat])
+    batch_time = time.perf_counter() - start
+
+    mismatches = int(np.count_nonzero(result != np.array(expected, dtype=bool)))
+    print("%d moves: validate_move() %.0f moves/s, validate_moves() %.0f moves/s, %d mismatches"
+          % (len(expected), len(expected) / loop_time, len(expected) / batch_time, mismatches))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Measures what the shared __slots__ pieces save. Memory is measured with tracemalloc as the bytes allocated per stored
+ChessVar, comparing the shared pieces against boards filled with one new piece object per square, both with the old
+__dict__ based pieces and with the current __slots__ ones. Throughput compares the old get_color() string check with
+the color_code integer check, and times make_move() on replayed games.
+
+Run from the repository root with: python benchmarks/bench_pieces.py [games]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import ChessVar
+from benchmarks.bench_backends import record_game
+
+
+class DictPiece:
+    """The piece layout from before the shared pieces: a __dict__ holding the color and name strings"""
+    def __init__(self, color, name):
+        self._color = color
+        self._name = name
+
+    def get_color(self):
+        return self._color
+
+
+def fill_with_new_pieces(game, piece_factory):
+    """Replaces every piece on a list backend game's board with a new object made by piece_factory(color, name)"""
+    board = game.get_board()
+    for row in board:
+        for col, piece in enumerate(row):
+            if piece is not None:
+                row[col] = piece_factory(piece.get_color(), piece.get_name())
+
+
+def bytes_per_game(game_count, build):
+    """Returns the bytes allocated per game while keeping game_count games built by build() alive"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [build() for _ in range(game_count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) / game_count
+
+
+def build_dict_pieces():
+    """Builds a game whose board has a new __dict__ based piece on every square"""
+    game = ChessVar()
+    fill_with_new_pieces(game, DictPiece)
+    return game
+
+
+def build_new_slotted_pieces():
+    """Builds a game whose board has a new __slots__ piece of the right subclass on every square"""
+    game = ChessVar()
+    board = game.get_board()
+    for row in board:
+        for col, piece in enumerate(row):
+            if piece is not None:
+                row[col] = piece.__class__(piece.get_color(), piece.get_name())
+    return game
+
+
+def color_checks(pieces, loops):
+    """Times loops passes of the string and the integer color check over pieces, returning both times in seconds"""
+    start = time.perf_counter()
+    for _ in range(loops):
+        for piece in pieces:
+            piece.get_color() != "WHITE"
+    string_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(loops):
+        for piece in pieces:
+            piece.color_code != 0
+    return string_time, time.perf_counter() - start
+
+
+def main(game_count=2000):
+    print("memory per stored game (%d games)" % game_count)
+    for label, build in (("new __dict__ pieces", build_dict_pieces),
+                         ("new __slots__ pieces", build_new_slotted_pieces),
+                         ("shared pieces", ChessVar),
+                         # the bitboard backend keeps the same shared pieces in its mailbox list
+                         ("bitboard backend", lambda: ChessVar("bitboard"))):
+        print("  %-22s %8.0f bytes" % (label, bytes_per_game(game_count, build)))
+
+    game = ChessVar()
+    pieces = [piece for row in game.get_board() for piece in row if piece is not None]
+    string_time, integer_time = color_checks(pieces, 20000)
+    checks = len(pieces) * 20000
+    print("color checks")
+    print("  %-22s %10.0f checks/s" % ("get_color() string", checks / string_time))
+    print("  %-22s %10.0f checks/s" % ("color_code integer", checks / integer_time))
+
+    rng = random.Random(0)
+    games = [record_game(rng) for _ in range(max(1, game_count // 10))]
+    start = time.perf_counter()
+    played = 0
+    for moves in games:
+        game = ChessVar()
+        for source, target in moves:
+            game.make_move(source, target)
+        played += len(moves)
+    elapsed = time.perf_counter() - start
+    print("make_move")
+    print("  %-22s %10.0f moves/s" % ("shared pieces", played / elapsed))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,49 @@
+"""
+Measures bulk replay throughput for game records: games are written to a temporary record file, then streamed back
+with read_games() and replayed through make_move() and through the trusted push_move() path.
+
+Run from the repository root with: python benchmarks/bench_replay.py [games]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import BACKENDS
+from records import GameWriter, read_games, replay_game
+from simulate import simulate_games
+
+
+def replay_file(path, trusted, backend):
+    """Streams every game in the record file at path through replay_game() and returns (games, moves) replayed"""
+    games = 0
+    moves = 0
+    with open(path) as file:
+        for record in read_games(file):
+            replay_game(record, trusted, backend)
+            games += 1
+            moves += len(record.get_moves())
+    return games, moves
+
+
+def main(game_count=2000):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "games.pgn")
+        with open(path, "w") as file:
+            writer = GameWriter(file)
+            for record in simulate_games(game_count, workers=1):
+                writer.write_game(record["move_list"], record["result"])
+        for backend in BACKENDS:
+            for trusted in (False, True):
+                start = time.perf_counter()
+                games, moves = replay_file(path, trusted, backend)
+                elapsed = time.perf_counter() - start
+                label = "%s %s" % (backend, "trusted" if trusted else "validated")
+                print("%-18s %7d games %9d moves in %6.3fs  %10.0f moves/s" % (label, games, moves, elapsed,
+                                                                                 moves / elapsed))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
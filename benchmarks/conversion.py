@@ -0,0 +1,87 @@
+"""
+Checks that best_move() converts won endgames in the fewest plies. An endgame table for King vs King and Rook is
+generated, then positions the table rates as short wins are played out: the winning side plays best_move() at a
+fixed depth, reusing one SearchEngine across moves as a game does, and the losing side plays the table's best
+defence. Every win has to finish in exactly the table's number of plies, which fails if the search's transposition
+table hands stale win distances from one move's search to the next.
+
+Run from the repository root with: python benchmarks/conversion.py [--positions N] [--max-plies N]
+The exit status is 1 if any win is converted late or not at all.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import ChessVar
+from subpieces import PIECES
+from tablebase import Tablebase, parse_material, generate_table, write_table
+
+MATERIAL = "Kkr"
+
+
+def setup_position(material, squares, turn):
+    """
+    Returns a new ChessVar with the material's pieces on squares. Types missing from the material get a count of 1 so
+    the game isn't over, and as they aren't on the board they can never be captured
+    """
+    board = [[None] * 8 for _ in range(8)]
+    counts = ({name: 1 for name in ChessVar().get_white_count()}, {name: 1 for name in ChessVar().get_black_count()})
+    for color, kind in set(material):
+        counts[color][PIECES[color][kind].get_name()] = 0
+    for (color, kind), square in zip(material, squares):
+        board[square >> 3][square & 7] = PIECES[color][kind]
+        counts[color][PIECES[color][kind].get_name()] += 1
+    game = ChessVar()
+    game.set_position(board, turn, counts[0], counts[1], "UNFINISHED")
+    return game
+
+
+def play_out(game, tablebase, max_depth):
+    """Plays a won position out and returns the number of plies it took, or None if the game didn't end in time"""
+    winner = game.get_turn()
+    for plies in range(1, 2 * max_depth + 1):
+        if game.get_turn() == winner:
+            game.make_move(*game.best_move(None, max_depth))
+        else:
+            game.push_move(*tablebase.get_move(game)[0])
+        if game.get_game_state() != "UNFINISHED":
+            return plies if game.get_game_state() == winner + "_WON" else None
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that best_move() converts endgame wins in the fewest plies")
+    parser.add_argument("--positions", type=int, default=25, help="number of won positions to play out")
+    parser.add_argument("--max-plies", type=int, default=7, help="longest win, in plies, to sample")
+    args = parser.parse_args(argv)
+    material = parse_material(MATERIAL)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "table.bin")
+        with open(path, "wb") as file:
+            write_table(file, material, generate_table(material))
+        failures = 0
+        with Tablebase(path) as tablebase:
+            rng = random.Random(0)
+            played = 0
+            while played < args.positions:
+                squares = rng.sample(range(64), len(material))
+                game = setup_position(material, squares, rng.choice(("WHITE", "BLACK")))
+                result = tablebase.probe(game)
+                # wins in one are a single capture, so they can't show a stale distance
+                if result is None or not 1 < result <= args.max_plies:
+                    continue
+                played += 1
+                plies = play_out(game, tablebase, args.max_plies + 1)
+                if plies != result:
+                    failures += 1
+                    print("  win in %d from %s took %s plies" % (result, squares, plies))
+    print("%d of %d wins converted in the fewest plies" % (args.positions - failures, args.positions))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Perft correctness and performance suite. perft counts the leaf nodes of the full move tree to a fixed depth, so any
+change to the move rules shows up as a wrong count. The counts are checked against the reference values stored below
+on every backend and nodes per second is reported for each. With --validate every node's generate_moves() is also
+compared against a brute force validate_move() over all 4096 source/target pairs, which checks the move generators
+against the per-piece rules in subpieces.py. A second section micro-benchmarks validate_move() per piece type.
+
+Run from the repository root with: python benchmarks/perft.py [--depth N] [--validate] [--backend NAME]
+The exit status is 1 if any count differs from its reference value.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import ChessVar, BACKENDS
+from piece import PIECE_TYPES
+from subpieces import PIECES
+
+# a position is either a list of moves played from the start or an 8 line board layout, rank 8 first, using the
+# letters PNBRQK for white and pnbrqk for black, "." for an empty square, and the player to move
+POSITIONS = {
+    "start": {"moves": []},
+    "open center": {"moves": [("e2", "e4"), ("d7", "d5"), ("g1", "f3"), ("b8", "c6")]},
+    "first capture": {"moves": [("e2", "e4"), ("d7", "d5"), ("e4", "d5"), ("d8", "d5"), ("b1", "c3")]},
+    "sparse": {
+        "layout": ["r...k..r",
+                   "p.pq.p.p",
+                   ".n..bn..",
+                   "..b.p.N.",
+                   ".P..P...",
+                   "..NB.Q..",
+                   "P.P..PPP",
+                   "R.B.K..R"],
+        "turn": "WHITE"
+    }
+}
+
+# leaf node counts for each position, by depth
+REFERENCE_COUNTS = {
+    "start": (20, 400, 8902, 197742),
+    "open center": (29, 862, 26134, 815582),
+    "first capture": (47, 1489, 62849, 2018961),
+    "sparse": (45, 2050, 90738, 4102491)
+}
+
+LETTERS = "pnbrqk"
+
+
+def board_from_layout(layout):
+    """Builds a 2d array of the shared Piece objects from an 8 line layout string list"""
+    board = []
+    for line in layout:
+        row = []
+        for letter in line:
+            if letter == ".":
+                row.append(None)
+            elif letter.isupper():
+                row.append(PIECES[0][LETTERS.index(letter.lower())])
+            else:
+                row.append(PIECES[1][LETTERS.index(letter)])
+        board.append(row)
+    return board
+
+
+def setup_position(name, backend):
+    """Returns a new ChessVar using backend set up in the named position"""
+    position = POSITIONS[name]
+    game = ChessVar(backend)
+    if "layout" in position:
+        game.set_position(board_from_layout(position["layout"]), position["turn"])
+    for source, target in position.get("moves", ()):
+        if not game.make_move(source, target):
+            raise ValueError("illegal setup move in position %s: %s%s" % (name, source, target))
+    return game
+
+
+def perft(game, depth):
+    """Returns the number of leaf nodes depth plies below the current position"""
+    moves = game.generate_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for source, target in moves:
+        game.push_move(source, target)
+        nodes += perft(game, depth - 1)
+        game.pop_move()
+    return nodes
+
+
+def brute_force_moves(game):
+    """Returns the set of (source, target) square index pairs validate_move() accepts, trying all 4096 of them"""
+    moves = set()
+    for source in range(64):
+        piece = game.get_piece(source >> 3, source & 7)
+        if piece is None:
+            continue
+        for target in range(64):
+            if game.validate_move(None, source >> 3, source & 7, target >> 3, target & 7):
+                moves.add((source, target))
+    return moves
+
+
+def validated_perft(game, depth):
+    """perft() that also raises AssertionError at any node where the generator and validate_move() disagree"""
+    moves = game.generate_moves()
+    if set(moves) != brute_force_moves(game) or len(moves) != len(set(moves)):
+        raise AssertionError("move generator disagrees with validate_move() after " + str(game.get_moves()))
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for source, target in moves:
+        game.push_move(source, target)
+        nodes += validated_perft(game, depth - 1)
+        game.pop_move()
+    return nodes
+
+
+def run_perft(depth, backends, validate):
+    """Runs perft on every position and backend, prints the results and returns the number of mismatches"""
+    failures = 0
+    print("perft to depth %d" % depth)
+    for name in POSITIONS:
+        for backend in backends:
+            game = setup_position(name, backend)
+            for current in range(1, depth + 1):
+                start = time.perf_counter()
+                if validate:
+                    nodes = validated_perft(game, current)
+                else:
+                    nodes = perft(game, current)
+                elapsed = time.perf_counter() - start
+                reference = REFERENCE_COUNTS[name]
+                if current > len(reference):
+                    status = "no reference"
+                elif nodes == reference[current - 1]:
+                    status = "ok"
+                else:
+                    status = "MISMATCH, expected %d" % reference[current - 1]
+                    failures += 1
+                print("  %-14s %-8s depth %d %10d nodes %10.0f nodes/s  %s" % (name, backend, current, nodes,
+                                                                             nodes / max(elapsed, 1e-9), status))
+    return failures
+
+
+def bench_validate_move(backends, loops=20):
+    """Times validate_move() for every source square holding each piece type against all 64 targets"""
+    print("validate_move per piece type")
+    for backend in backends:
+        games = [setup_position(name, backend) for name in POSITIONS]
+        for type_code, name in enumerate(PIECE_TYPES):
+            calls = 0
+            start = time.perf_counter()
+            for game in games:
+                color_code = 0 if game.get_turn() == "WHITE" else 1
+                sources = [(row, col) for row in range(8) for col in range(8)
+                           if game.get_piece(row, col) is PIECES[color_code][type_code]]
+                for _ in range(loops):
+                    for row, col in sources:
+                        for target in range(64):
+                            game.validate_move(None, row, col, target >> 3, target & 7)
+                calls += loops * 64 * len(sources)
+            elapsed = time.perf_counter() - start
+            print("  %-8s %-7s %10.0f calls/s" % (backend, name, calls / max(elapsed, 1e-9)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft correctness and performance suite for ChessVar")
+    parser.add_argument("--depth", type=int, default=3, help="deepest perft depth to run")
+    parser.add_argument("--validate", action="store_true", help="cross-check every node against validate_move()")
+    parser.add_argument("--backend", choices=BACKENDS, action="append", help="backend to run, defaults to all")
+    args = parser.parse_args(argv)
+    backends = args.backend or BACKENDS
+    failures = run_perft(args.depth, backends, args.validate)
+    bench_validate_move(backends)
+    if failures:
+        print("%d perft counts differ from their reference values" % failures)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
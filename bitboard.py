@@ -0,0 +1,275 @@
+from subpieces import *
+from squares import DIRECTIONS, SLIDER_DIRECTIONS
+
+
+# type indexes for the back rank, from the a column to the h column
+BACK_RANK = (3, 1, 2, 4, 5, 2, 1, 3)
+
+# square indexes are row * 8 + col with row 0 being black's back rank, so a direction from squares.py is "positive"
+# when stepping along it increases the square index
+POSITIVE = (True, True, False, False, True, True, False, False)
+ALL_SQUARES = (1 << 64) - 1
+
+
+def _build_jump_table(offsets):
+    """Returns a list of 64 masks with a bit set for every on-board square reached by one of the (row, col) offsets"""
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        mask = 0
+        for row_step, col_step in offsets:
+            if 0 <= row + row_step < 8 and 0 <= col + col_step < 8:
+                mask |= 1 << ((row + row_step) * 8 + col + col_step)
+        table.append(mask)
+    return table
+
+
+def _build_rays():
+    """Returns RAYS[direction][square], the mask of every square from square to the edge of the board"""
+    rays = []
+    for row_step, col_step in DIRECTIONS:
+        table = []
+        for square in range(64):
+            row, col = divmod(square, 8)
+            mask = 0
+            row, col = row + row_step, col + col_step
+            while 0 <= row < 8 and 0 <= col < 8:
+                mask |= 1 << (row * 8 + col)
+                row, col = row + row_step, col + col_step
+            table.append(mask)
+        rays.append(table)
+    return rays
+
+
+def _build_lines():
+    """
+    Returns two 64x64 tables:
+    * lines[source][target]: the direction index leading from source to target, or -1 if they don't share a line
+    * between[source][target]: the mask of the squares strictly between source and target on that line
+    """
+    lines = [[-1] * 64 for _ in range(64)]
+    between = [[0] * 64 for _ in range(64)]
+    for direction, (row_step, col_step) in enumerate(DIRECTIONS):
+        for square in range(64):
+            row, col = divmod(square, 8)
+            mask = 0
+            row, col = row + row_step, col + col_step
+            while 0 <= row < 8 and 0 <= col < 8:
+                lines[square][row * 8 + col] = direction
+                between[square][row * 8 + col] = mask
+                mask |= 1 << (row * 8 + col)
+                row, col = row + row_step, col + col_step
+    return lines, between
+
+
+KNIGHT_ATTACKS = _build_jump_table(((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)))
+KING_ATTACKS = _build_jump_table(((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)))
+# white pawns capture up the board (toward row 0) and black pawns capture down the board
+PAWN_ATTACKS = (_build_jump_table(((-1, -1), (-1, 1))), _build_jump_table(((1, -1), (1, 1))))
+RAYS = _build_rays()
+LINES, BETWEEN = _build_lines()
+
+
+def lowest_square(mask):
+    """Returns the index of the lowest set bit in a non-empty mask"""
+    return (mask & -mask).bit_length() - 1
+
+
+def sliding_attacks(square, occupied, directions):
+    """
+    Returns the mask of squares a slider on square attacks along directions. Each ray stops at (and includes) the first
+    occupied square it meets.
+    """
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            # the nearest blocker is the lowest bit on positive rays and the highest bit on negative rays
+            if POSITIVE[direction]:
+                first = lowest_square(blockers)
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAYS[direction][first]
+        attacks |= ray
+    return attacks
+
+
+class BitBoard:
+    """
+    Alternative board engine for ChessVar built on 64-bit integer masks. Square indexes are row * 8 + col using the
+    same rows and columns as ChessVar's 2d board. In CPython this is not a faster board than the list one: each
+    make_move() and validate_move() goes through one more method call, and updating the masks costs more than
+    assigning two list slots. benchmarks/bench_backends.py measures it at about 0.7 times the list board's
+    validate_move() rate, with make_move() at best level. It is quicker at generate_moves(), and it gives move
+    generation and search code the masks. Contains three data members:
+    * pieces: pieces[color][type] is the mask of squares holding that color and type of piece
+    * occupancy: occupancy[color] is the mask of every square holding a piece of that color
+    * mailbox: a list of 64 shared Piece objects from PIECES, or None for empty squares, for constant time lookup
+    """
+    def __init__(self):
+        self._pieces = [[0] * 6 for _ in COLORS]
+        self._occupancy = [0, 0]
+        self._mailbox = [None] * 64
+        for col, kind in enumerate(BACK_RANK):
+            self.put(0 * 8 + col, 1, kind)
+            self.put(1 * 8 + col, 1, 0)
+            self.put(6 * 8 + col, 0, 0)
+            self.put(7 * 8 + col, 0, kind)
+
+    def load(self, board):
+        """Replaces the position with the pieces on a 2d array of Piece objects laid out like ChessVar's list board"""
+        self._pieces = [[0] * 6 for _ in COLORS]
+        self._occupancy = [0, 0]
+        self._mailbox = [None] * 64
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece is not None:
+                    self.put(row * 8 + col, piece.color_code, piece.type_code)
+
+    def get_pieces(self, color, kind):
+        """Returns the mask of squares holding the given color and type indexes"""
+        return self._pieces[color][kind]
+
+    def get_occupancy(self, color):
+        """Returns the mask of squares holding pieces of the given color index"""
+        return self._occupancy[color]
+
+    def get_occupied(self):
+        """Returns the mask of every occupied square"""
+        return self._occupancy[0] | self._occupancy[1]
+
+    def put(self, square, color, kind):
+        """Places a piece of the given color and type codes on an empty square"""
+        bit = 1 << square
+        self._pieces[color][kind] |= bit
+        self._occupancy[color] |= bit
+        self._mailbox[square] = PIECES[color][kind]
+
+    def piece_at(self, row, col):
+        """Returns the Piece on the given coordinates, or None if the square is empty"""
+        return self._mailbox[row * 8 + col]
+
+    def validate_move(self, turn, source_row, source_col, target_row, target_col):
+        """
+        Checks whether the player whose turn it is may move the piece on the source coordinates to the target
+        coordinates. The piece rules are the same as the validate_move() methods in subpieces.py.
+        * turn: the color code of the player whose turn it is
+        """
+        source = source_row * 8 + source_col
+        target = target_row * 8 + target_col
+        piece = self._mailbox[source]
+        # the source square has to hold one of the moving player's pieces. a mailbox lookup is cheaper than testing the
+        # occupancy mask, since shifting a 64-bit int allocates a new one
+        if piece is None or piece.color_code != turn:
+            return False
+        color = turn
+        kind = piece.type_code
+        target_bit = 1 << target
+        # the target square can't hold one of the moving player's own pieces
+        if self._occupancy[color] & target_bit:
+            return False
+        # knights and kings only need their jump table
+        if kind == 1:
+            return KNIGHT_ATTACKS[source] & target_bit != 0
+        if kind == 5:
+            return KING_ATTACKS[source] & target_bit != 0
+        occupied = self._occupancy[0] | self._occupancy[1]
+        if kind == 0:
+            # diagonal captures need an opposing piece on the target square
+            if PAWN_ATTACKS[color][source] & target_bit:
+                return self._occupancy[1 - color] & target_bit != 0
+            step = -8 if color == 0 else 8
+            if occupied & target_bit:
+                return False
+            if target == source + step:
+                return True
+            # double move from the starting row, the square in between must also be empty
+            start_row = 6 if color == 0 else 1
+            return source_row == start_row and target == source + 2 * step and not occupied & (1 << (source + step))
+        # rooks, bishops and queens need a shared line and nothing in between
+        direction = LINES[source][target]
+        if direction == -1 or (kind == 3 and direction > 3) or (kind == 2 and direction < 4):
+            return False
+        return BETWEEN[source][target] & occupied == 0
+
+    def generate_moves(self, color, sources=ALL_SQUARES):
+        """
+        Returns every legal move for the color index as (source, target) square index pairs. Only pieces standing on
+        the squares in the sources mask are considered.
+        """
+        moves = []
+        own = self._occupancy[color]
+        opponent = self._occupancy[1 - color]
+        occupied = own | opponent
+        empty = ~occupied & ALL_SQUARES
+        for kind in range(6):
+            remaining = self._pieces[color][kind] & sources
+            while remaining:
+                source = lowest_square(remaining)
+                remaining &= remaining - 1
+                if kind == 0:
+                    targets = self._pawn_targets(color, source, empty, opponent)
+                elif kind == 1:
+                    targets = KNIGHT_ATTACKS[source] & ~own
+                elif kind == 5:
+                    targets = KING_ATTACKS[source] & ~own
+                else:
+                    targets = sliding_attacks(source, occupied, SLIDER_DIRECTIONS[kind]) & ~own
+                while targets:
+                    moves.append((source, lowest_square(targets)))
+                    targets &= targets - 1
+        return moves
+
+    def _pawn_targets(self, color, source, empty, opponent):
+        """Helper method for generate_moves. Returns the mask of squares the pawn on source can push or capture to"""
+        captures = PAWN_ATTACKS[color][source] & opponent
+        # white pawns push toward row 0 and black pawns push toward row 7
+        if color == 0:
+            push = (1 << source) >> 8 & empty
+            if push and source >> 3 == 6:
+                push |= push >> 8 & empty
+        else:
+            push = (1 << source) << 8 & empty
+            if push and source >> 3 == 1:
+                push |= push << 8 & empty
+        return push | captures
+
+    def move_piece(self, source, target):
+        """
+        Moves the piece on source to target, both row * 8 + col square indexes, and returns (moving Piece, captured
+        Piece or None)
+        """
+        mailbox = self._mailbox
+        moving = mailbox[source]
+        captured = mailbox[target]
+        target_bit = 1 << target
+        both = 1 << source | target_bit
+        # take the captured piece off its masks, then slide the moving piece from source to target
+        if captured is not None:
+            self._pieces[captured.color_code][captured.type_code] ^= target_bit
+            self._occupancy[captured.color_code] ^= target_bit
+        self._pieces[moving.color_code][moving.type_code] ^= both
+        self._occupancy[moving.color_code] ^= both
+        mailbox[target] = moving
+        mailbox[source] = None
+        return moving, captured
+
+    def unmove_piece(self, source, target, captured):
+        """Reverses move_piece(), moving the piece back to source and restoring the captured Piece on target"""
+        mailbox = self._mailbox
+        moving = mailbox[target]
+        target_bit = 1 << target
+        both = 1 << source | target_bit
+        self._pieces[moving.color_code][moving.type_code] ^= both
+        self._occupancy[moving.color_code] ^= both
+        mailbox[source] = moving
+        mailbox[target] = captured
+        if captured is not None:
+            self._pieces[captured.color_code][captured.type_code] ^= target_bit
+            self._occupancy[captured.color_code] ^= target_bit
+
+    def to_list(self):
+        """Builds a 2d list of Piece objects in the same layout as ChessVar's list board"""
+        return [self._mailbox[row * 8:row * 8 + 8] for row in range(8)]
@@ -0,0 +1,176 @@
+"""
+Opening book for ChessVar built from self-play. Games are played with simulate.py's worker pool, and for every
+position in their first max_ply plies the book records how often each move was played and how the player who made it
+scored: 2 points for a win, 1 for a game that went unfinished and 0 for a loss. Moves played fewer than min_games
+times are dropped.
+
+The book file is a sorted array of fixed size entries, so OpeningBook can mmap it and binary search it by Zobrist
+hash without reading it in:
+
+    header:  b"CVOB", format version (uint16), reserved (uint16), entry count (uint64)
+    entry:   position hash (uint64), move as source * 64 + target (uint16), games (uint16), points (uint16)
+
+Entries for the same position are next to each other, best scoring first.
+
+Build one from the repository root with: python book.py --games 200 --output book.bin
+"""
+import argparse
+import mmap
+import struct
+
+from game import ChessVar
+from simulate import simulate_games, random_policy, engine_policy
+from squares import SQUARE_INDEX
+
+MAGIC = b"CVOB"
+VERSION = 1
+# the first few moves of each self-play game are random so the games don't all follow the engine's one line
+RANDOM_PLIES = 4
+
+_HEADER = struct.Struct("<4sHHQ")
+_ENTRY = struct.Struct("<QHHH")
+
+
+def book_policy(game, rng, moves):
+    """Self-play policy for building a book: random moves for the first RANDOM_PLIES plies, the engine's after that"""
+    if len(game.get_moves()) < RANDOM_PLIES:
+        return random_policy(game, rng, moves)
+    return engine_policy(game, rng, moves)
+
+
+def collect_statistics(games, max_ply=16):
+    """
+    Returns {position hash: {move: [games, points]}} over the first max_ply plies of each game, moves being source *
+    64 + target.
+    * games: an iterable of (move_list, result) pairs, move_list holding (source, target) chess notation pairs and
+                result being the game state the game ended in
+    """
+    statistics = {}
+    for move_list, result in games:
+        game = ChessVar()
+        for source, target in move_list[:max_ply]:
+            # score the move for the player making it
+            if result == "UNFINISHED":
+                points = 1
+            elif result == game.get_turn() + "_WON":
+                points = 2
+            else:
+                points = 0
+            source_index, target_index = SQUARE_INDEX[source], SQUARE_INDEX[target]
+            moves = statistics.setdefault(game.get_hash(), {})
+            counts = moves.setdefault(source_index << 6 | target_index, [0, 0])
+            counts[0] += 1
+            counts[1] += points
+            game.push_move(source_index, target_index)
+    return statistics
+
+
+def write_book(file, statistics, min_games=2):
+    """Writes statistics from collect_statistics() to a binary file object as a book and returns the entry count"""
+    entries = []
+    for key, moves in statistics.items():
+        for move, (games, points) in moves.items():
+            if games >= min_games:
+                # the 16 bit fields saturate rather than wrap, keeping the points to games ratio
+                scale = max(1, games / 0xFFFF, points / 0xFFFF)
+                entries.append((key, move, int(games / scale), int(points / scale)))
+    # best scoring move first within each position, with more games breaking ties
+    entries.sort(key=lambda entry: (entry[0], -entry[3] / entry[2], -entry[2]))
+    file.write(_HEADER.pack(MAGIC, VERSION, 0, len(entries)))
+    for entry in entries:
+        file.write(_ENTRY.pack(*entry))
+    file.flush()
+    return len(entries)
+
+
+class OpeningBook:
+    """
+    Reads a book file through mmap and looks positions up by hash. Contains three data members:
+    * file: the open book file
+    * map: the read-only mmap of the whole file
+    * count: the number of entries in the book
+    """
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can't be mapped
+            self._file.close()
+            raise ValueError("not a ChessVar opening book: " + str(path)) from None
+        valid = len(self._map) >= _HEADER.size
+        if valid:
+            magic, version, _, self._count = _HEADER.unpack_from(self._map, 0)
+            valid = (magic == MAGIC and version == VERSION and
+                     len(self._map) == _HEADER.size + self._count * _ENTRY.size)
+        if not valid:
+            self.close()
+            raise ValueError("not a ChessVar opening book: " + str(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _key_at(self, index):
+        """Returns the position hash of entry index"""
+        return _ENTRY.unpack_from(self._map, _HEADER.size + index * _ENTRY.size)[0]
+
+    def get_entries(self, key):
+        """Returns the book's ((source, target), games, points) entries for the position with hash key, best first"""
+        # binary search for the first entry with this key
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) >> 1
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self._count:
+            entry_key, move, games, points = _ENTRY.unpack_from(self._map, _HEADER.size + low * _ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append(((move >> 6, move & 63), games, points))
+            low += 1
+        return entries
+
+    def get_move(self, game):
+        """
+        Returns the book's best move for a ChessVar's current position as a (source, target) square index pair, or None
+        if the position isn't in the book. A move that isn't legal, which only a hash collision could give, is skipped.
+        """
+        for (source, target), _, _ in self.get_entries(game.get_hash()):
+            if game.validate_move(None, source >> 3, source & 7, target >> 3, target & 7):
+                return source, target
+        return None
+
+    def close(self):
+        """Unmaps and closes the book file"""
+        self._map.close()
+        self._file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a ChessVar opening book from self-play")
+    parser.add_argument("--games", type=int, default=200, help="number of self-play games")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the CPU count")
+    parser.add_argument("--seed", type=int, default=0, help="self-play batch seed")
+    parser.add_argument("--max-moves", type=int, default=300, help="moves after which a game is abandoned")
+    parser.add_argument("--max-ply", type=int, default=16, help="deepest ply recorded in the book")
+    parser.add_argument("--min-games", type=int, default=2, help="fewest games a move needs to be kept")
+    parser.add_argument("--output", required=True, help="book file to write")
+    args = parser.parse_args(argv)
+    records = simulate_games(args.games, book_policy, args.workers, seed=args.seed, max_moves=args.max_moves)
+    statistics = collect_statistics(((record["move_list"], record["result"]) for record in records), args.max_ply)
+    with open(args.output, "wb") as file:
+        count = write_book(file, statistics, args.min_games)
+    print("%d positions, %d entries written to %s" % (len(statistics), count, args.output))
+
+
+if __name__ == "__main__":
+    main()
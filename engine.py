@@ -0,0 +1,302 @@
+import time
+
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+
+# score for a won position. wins found closer to the root score slightly higher so the engine takes the quickest one
+WIN_SCORE = 100000
+WIN_THRESHOLD = WIN_SCORE - 1000
+# value of each piece still on the board
+PIECE_VALUES = {
+    "PAWN": 10,
+    "KNIGHT": 30,
+    "BISHOP": 30,
+    "ROOK": 50,
+    "QUEEN": 90,
+    "KING": 40
+}
+# penalty for having only n pieces of a type left, indexed by n. with one left a single capture loses the game
+SCARCITY_PENALTY = (0, 300, 90, 30, 15, 8, 5, 3, 2)
+# how many nodes are searched between checks of the clock. CPython searches roughly 60 nodes a millisecond, so this
+# keeps a search within about a millisecond of its deadline
+CLOCK_INTERVAL = 32
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time limit runs out, unwinding it back to search()"""
+    pass
+
+
+def score_to_table(score, ply):
+    """
+    Converts a search score at ply from the root into the score stored in the transposition table. Win and loss
+    scores count plies from the root, which changes from one search to the next, so they are stored counting from the
+    position itself instead
+    """
+    if score >= WIN_THRESHOLD:
+        return score + ply
+    if score <= -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_table(value, ply):
+    """Converts a score stored by score_to_table() back into a search score at ply from the current root"""
+    if value >= WIN_THRESHOLD:
+        return value - ply
+    if value <= -WIN_THRESHOLD:
+        return value + ply
+    return value
+
+
+def side_score(count):
+    """Scores one player's count dict: the value of their pieces minus a penalty for every type they are short on"""
+    score = 0
+    for name, remaining in count.items():
+        score += PIECE_VALUES[name] * remaining - SCARCITY_PENALTY[remaining]
+    return score
+
+
+def evaluate(game):
+    """
+    Evaluates a ChessVar position from the point of view of the player whose turn it is. Since the game is lost as soon
+    as any type of piece runs out, the evaluation is built on the two count dicts and punishes scarce types heavily.
+    """
+    if game.get_game_state() != "UNFINISHED":
+        # a move that wins hands the turn to the loser, so a finished game is always lost for the player to move
+        return -WIN_SCORE
+    score = side_score(game.get_white_count()) - side_score(game.get_black_count())
+    if game.get_turn() == "WHITE":
+        return score
+    return -score
+
+
+class SearchEngine:
+    """
+    Iterative deepening alpha-beta search for ChessVar. Moves are made and taken back with push_move() and pop_move()
+    on the game being searched, so the game is left as it was when the search returns. An opening book and endgame
+    tables can be added, and a position either of them covers is answered from them without searching. The book
+    serves games played from the start. Endgame tables never match those, since each player keeps a piece of every
+    type, so they only answer positions set up with set_position(), and turn every other position away after
+    comparing piece counts. Contains six data members:
+    * table: the TranspositionTable holding search results, kept between searches
+    * book: the OpeningBook from book.py consulted before searching, or None
+    * tablebases: the list of Tablebase objects from tablebase.py consulted before searching
+    * nodes: the number of positions visited by the last search
+    * deadline: the time.perf_counter() value at which the current search has to stop
+    * clock: the number of nodes left until the clock is next checked
+    """
+    def __init__(self, table=None):
+        if table is None:
+            table = TranspositionTable()
+        self._table = table
+        self._book = None
+        self._tablebases = []
+        self._nodes = 0
+        self._deadline = None
+        self._clock = CLOCK_INTERVAL
+
+    def get_nodes(self):
+        """Returns the number of positions visited by the last search"""
+        return self._nodes
+
+    def set_book(self, book):
+        """Sets the OpeningBook consulted before searching, or None for no book"""
+        self._book = book
+
+    def add_tablebase(self, tablebase):
+        """Adds a Tablebase to those consulted before searching"""
+        self._tablebases.append(tablebase)
+
+    def probe_tables(self, game):
+        """
+        Returns a (move, score, 0) tuple like search() if the book or an endgame table covers game's position,
+        otherwise None. Book moves score 0, table results score like a search that found the win or loss
+        """
+        for tablebase in self._tablebases:
+            answer = tablebase.get_move(game)
+            if answer is not None:
+                move, result = answer
+                if result > 0:
+                    return move, WIN_SCORE - result, 0
+                if result < 0:
+                    return move, -WIN_SCORE - result, 0
+                return move, 0, 0
+        if self._book is not None:
+            move = self._book.get_move(game)
+            if move is not None:
+                return move, 0, 0
+        return None
+
+    def search(self, game, time_ms=None, max_depth=64, moves=None):
+        """
+        Searches game one ply deeper at a time until time_ms milliseconds have passed, max_depth is reached or a forced
+        win or loss is found. Returns a (move, score, depth) tuple, where move is a (source, target) square index pair
+        and depth is the deepest fully searched depth, or (None, 0, 0) if the player to move has no moves. A position
+        the book or an endgame table covers is answered by probe_tables() instead, with a depth of 0.
+        * moves: the root moves to search, defaulting to generate_moves(). Of the moves that score best, the one
+                 earliest in the list is returned, so shuffling them breaks ties at random
+        """
+        # the time limit covers the whole call, table probes and root move ordering included
+        self._deadline = None
+        if time_ms is not None:
+            self._deadline = time.perf_counter() + time_ms / 1000
+        answer = self.probe_tables(game)
+        if answer is not None:
+            return answer
+        if moves is None:
+            moves = game.generate_moves()
+        moves = self.order_moves(game, moves)
+        if not moves:
+            return None, 0, 0
+        self._nodes = 0
+        self._clock = CLOCK_INTERVAL
+        # if even the first depth runs out of time, fall back on the best looking move
+        best = (moves[0], 0, 0)
+        for depth in range(1, max_depth + 1):
+            started = time.perf_counter()
+            try:
+                move, score = self._search_root(game, moves, depth)
+            except SearchTimeout:
+                break
+            best = (move, score, depth)
+            if abs(score) >= WIN_THRESHOLD:
+                break
+            # each depth takes longer than the last, so one that can't finish in the time left isn't started
+            finished = time.perf_counter()
+            if self._deadline is not None and finished - started > self._deadline - finished:
+                break
+            # the best move of this depth is searched first on the next one, which gives the most cutoffs
+            moves.remove(move)
+            moves.insert(0, move)
+        return best
+
+    def order_moves(self, game, moves, first=None):
+        """
+        Sorts moves so captures come first, taking the opponent's scarcest type of piece before anything else since
+        capturing the last of a type wins the game. first, usually the transposition table's best move, leads the list.
+        """
+        if game.get_turn() == "WHITE":
+            opponent_count = game.get_black_count()
+        else:
+            opponent_count = game.get_white_count()
+        captures = []
+        quiet = []
+        for move in moves:
+            if move == first:
+                continue
+            target = move[1]
+            captured = game.get_piece(target >> 3, target & 7)
+            if captured is None:
+                quiet.append(move)
+            else:
+                captures.append((opponent_count[captured.get_name()], -PIECE_VALUES[captured.get_name()], move))
+        # the sort is stable, so equally good captures stay in the order they were given in
+        captures.sort(key=lambda capture: capture[:2])
+        ordered = [move for _, _, move in captures]
+        if first is not None and first in moves:
+            ordered.insert(0, first)
+        ordered.extend(quiet)
+        return ordered
+
+    def _search_root(self, game, moves, depth):
+        """Searches every root move to depth and returns the best (move, score)"""
+        alpha = -WIN_SCORE - 1
+        beta = WIN_SCORE + 1
+        best_move = moves[0]
+        for move in moves:
+            game.push_move(*move)
+            try:
+                score = -self._search(game, depth - 1, -beta, -alpha, 1)
+            finally:
+                game.pop_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self._table.store(game.get_hash(), alpha, depth, EXACT, best_move)
+        return best_move, alpha
+
+    def _tick(self):
+        """Counts a node and raises SearchTimeout if the deadline has passed"""
+        self._nodes += 1
+        self._clock -= 1
+        if self._clock == 0:
+            self._clock = CLOCK_INTERVAL
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise SearchTimeout()
+
+    def _search(self, game, depth, alpha, beta, ply):
+        """Negamax alpha-beta search of the position in game, returning its score for the player to move"""
+        self._tick()
+        if game.get_game_state() != "UNFINISHED":
+            return -WIN_SCORE + ply
+        if depth == 0:
+            return self._quiesce(game, alpha, beta, ply)
+
+        # a stored result from at least this depth can answer the position outright if its bound allows it
+        key = game.get_hash()
+        entry = self._table.probe(key)
+        table_move = None
+        if entry is not None:
+            stored_depth, value, flag, table_move = entry
+            value = score_from_table(value, ply)
+            if stored_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER_BOUND and value >= beta:
+                    return value
+                if flag == UPPER_BOUND and value <= alpha:
+                    return value
+
+        moves = self.order_moves(game, game.generate_moves(), table_move)
+        # a player with no moves at all can't lose a piece this turn, so call it even
+        if not moves:
+            return 0
+        original_alpha = alpha
+        best_score = -WIN_SCORE - 1
+        best_move = None
+        for move in moves:
+            game.push_move(*move)
+            try:
+                score = -self._search(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.pop_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self._table.store(key, score_to_table(best_score, ply), depth, flag, best_move)
+        return best_score
+
+    def _quiesce(self, game, alpha, beta, ply):
+        """Searches captures only until the position is quiet, so the evaluation isn't taken in the middle of a trade"""
+        self._tick()
+        if game.get_game_state() != "UNFINISHED":
+            return -WIN_SCORE + ply
+        stand_pat = evaluate(game)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        captures = [move for move in game.generate_moves() if game.get_piece(move[1] >> 3, move[1] & 7) is not None]
+        for move in self.order_moves(game, captures):
+            game.push_move(*move)
+            try:
+                score = -self._quiesce(game, -beta, -alpha, ply + 1)
+            finally:
+                game.pop_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
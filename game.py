@@ -1,23 +1,49 @@
 from subpieces import *
+from bitboard import BitBoard
+from mailbox_board import MailboxBoard
+from squares import ROWS, COLUMNS, SQUARE_NAMES, SQUARE_INDEX
+from movegen import generate_moves, generate_square_moves
+from zobrist import PIECE_KEYS, BLACK_TO_MOVE, compute_hash
+from engine import SearchEngine
+from attacks import AttackMap
+
+
+# the ways ChessVar can store its board, see the backend parameter
+BACKENDS = ("list", "bitboard", "mailbox")
 
 
 class ChessVar:
     """
-    Simulates the chess variant game. Contains seven data members:
+    Simulates the chess variant game. Contains fourteen data members:
     * game_state: a string representing the game's status, can be "UNFINISHED", "BLACK_WON" or "WHITE_WON"
     * turn: a string representing whose turn it is, can be "WHITE" or "BLACK"
-    * rows: a string representing the numbered rows used in chess notation. this is used to get the index values
-                for each move inputted in the make_move() method
-    * columns: a string representing the letters columns used in chess notation. this is used to get the row values
-                for each move inputted in the make_move() method
+    * turn_code: the integer color code from piece.py for turn, so hot paths can compare it to a Piece's color_code
+    * rows: a string representing the numbered rows used in chess notation, in board order
+    * columns: a string representing the letters columns used in chess notation, in board order. make_move() parses
+                notation with the SQUARE_INDEX table built from these in squares.py
     * white_count, black_count: dictionaries representing the remaining number of pieces for each player
-    * board: a 2d array representing the chess board
+    * piece_count: the number of pieces on the board. it can differ from the count dicts' total after set_position()
+    * board: a 2d array representing the chess board, or None when another backend holds the pieces
+    * history: a list of (source, target, captured piece, previous game_state, previous hash) entries, one per move,
+                used by pop_move()
+    * hash: the Zobrist hash of the current position, covering every piece's color, type and square plus whose turn
+                it is. it is updated incrementally by each move
+    * search_engine: the SearchEngine used by best_move(), created on its first call so its transposition table is
+                reused on later moves
+    * engine: the BitBoard or MailboxBoard holding the pieces when the "bitboard" or "mailbox" backend is used,
+                otherwise None
+    * attack_map: the AttackMap behind get_attacked_squares() and get_attackers(), created on the first query and
+                from then on told which squares each move touches so it only redoes those
+    The backend parameter picks how the board is stored, either "list" (the default 2d array), "bitboard" or "mailbox"
+    (a flat 0x88 array). The list board is the fastest at make_move() and validate_move(), see
+    benchmarks/bench_backends.py.
     """
-    def __init__(self):
+    def __init__(self, backend="list"):
         self._game_state = "UNFINISHED"
         self._turn = "WHITE"
-        self._rows = "87654321"
-        self._columns = "abcdefgh"
+        self._turn_code = WHITE
+        self._rows = ROWS
+        self._columns = COLUMNS
         self._white_count = {
             "PAWN": 8,
             "ROOK": 2,
@@ -34,24 +60,75 @@ class ChessVar:
             "QUEEN": 1,
             "KING": 1
         }
+        # every square shares the one immutable Piece object for its color and type, see PIECES in subpieces.py
+        white = PIECES[WHITE]
+        black = PIECES[BLACK]
         self._board = [
             # row 0
-            [Rook("BLACK", "ROOK"), Knight("BLACK", "KNIGHT"), Bishop("BLACK", "BISHOP"), Queen("BLACK", "QUEEN"),
-             King("BLACK", "KING"), Bishop("BLACK", "BISHOP"), Knight("BLACK", "KNIGHT"), Rook("BLACK", "ROOK")],
+            [black[3], black[1], black[2], black[4], black[5], black[2], black[1], black[3]],
             # row 1
-            [Pawn("BLACK", "PAWN"), Pawn("BLACK", "PAWN"), Pawn("BLACK", "PAWN"), Pawn("BLACK", "PAWN"),
-             Pawn("BLACK", "PAWN"), Pawn("BLACK", "PAWN"), Pawn("BLACK", "PAWN"), Pawn("BLACK", "PAWN")],
+            [black[0], black[0], black[0], black[0], black[0], black[0], black[0], black[0]],
             [None, None, None, None, None, None, None, None],
             [None, None, None, None, None, None, None, None],
             [None, None, None, None, None, None, None, None],
             [None, None, None, None, None, None, None, None],
             # row 6
-            [Pawn("WHITE", "PAWN"), Pawn("WHITE", "PAWN"), Pawn("WHITE", "PAWN"), Pawn("WHITE", "PAWN"),
-             Pawn("WHITE", "PAWN"), Pawn("WHITE", "PAWN"), Pawn("WHITE", "PAWN"), Pawn("WHITE", "PAWN")],
+            [white[0], white[0], white[0], white[0], white[0], white[0], white[0], white[0]],
             # row 7
-            [Rook("WHITE", "ROOK"), Knight("WHITE", "KNIGHT"), Bishop("WHITE", "BISHOP"), Queen("WHITE", "QUEEN"),
-             King("WHITE", "KING"), Bishop("WHITE", "BISHOP"), Knight("WHITE", "KNIGHT"), Rook("WHITE", "ROOK")]
+            [white[3], white[1], white[2], white[4], white[5], white[2], white[1], white[3]]
         ]
+        self._piece_count = 32
+        self._history = []
+        self._search_engine = None
+        self._engine = None
+        self._attack_map = None
+        if backend == "bitboard":
+            # the bitboards or the 0x88 array replace the 2d array, get_board() rebuilds one only when it is asked for
+            self._engine = BitBoard()
+            self._board = None
+        elif backend == "mailbox":
+            self._engine = MailboxBoard()
+            self._board = None
+        elif backend != "list":
+            raise ValueError("unknown board backend: " + str(backend))
+        self._hash = compute_hash(self.get_board(), self._turn)
+
+    def set_position(self, board, turn, white_count=None, black_count=None, game_state=None):
+        """
+        Sets up an arbitrary position, clearing the move history so pop_move() can't go back past it.
+        * board: a 2d array of Piece objects laid out like the list board. it is copied, not kept
+        * turn: "WHITE" or "BLACK"
+        * white_count, black_count: the count dicts. since pieces are never added to the board they default to the
+                pieces on it, which is what make_move() would have left
+        * game_state: defaults to a win for the player whose opponent has run out of a type of piece
+        """
+        if white_count is None or black_count is None:
+            counts = ({name: 0 for name in self._white_count}, {name: 0 for name in self._black_count})
+            for row in board:
+                for piece in row:
+                    if piece is not None:
+                        counts[piece.color_code][piece.get_name()] += 1
+            white_count, black_count = counts
+        if game_state is None:
+            game_state = "UNFINISHED"
+            if 0 in black_count.values():
+                game_state = "WHITE_WON"
+            elif 0 in white_count.values():
+                game_state = "BLACK_WON"
+        self._white_count = dict(white_count)
+        self._black_count = dict(black_count)
+        self._game_state = game_state
+        self._turn = turn
+        self._turn_code = COLOR_CODES[turn]
+        if self._engine is not None:
+            self._engine.load(board)
+        else:
+            self._board = [list(row) for row in board]
+        self._piece_count = sum(1 for row in board for piece in row if piece is not None)
+        self._history = []
+        self._hash = compute_hash(board, turn)
+        if self._attack_map is not None:
+            self._attack_map.reset()
 
     def get_game_state(self):
         """Returns game_state"""
@@ -62,73 +139,159 @@ class ChessVar:
         self._game_state = new_state
 
     def get_board(self):
-        """Returns the board data member"""
+        """
+        Returns the board data member. With the bitboard and mailbox backends a 2d array of Piece objects is built on
+        each call as a read-only snapshot, so changing it doesn't affect the game.
+        """
+        if self._engine is not None:
+            return self._engine.to_list()
         return self._board
 
+    def get_hash(self):
+        """Returns the Zobrist hash of the current position, suitable as a TranspositionTable key"""
+        return self._hash
+
+    def get_white_count(self):
+        """Returns the dict of white's remaining number of pieces for each type"""
+        return self._white_count
+
+    def get_black_count(self):
+        """Returns the dict of black's remaining number of pieces for each type"""
+        return self._black_count
+
+    def get_piece_count(self):
+        """Returns the number of pieces on the board"""
+        return self._piece_count
+
+    def get_moves(self):
+        """Returns the moves played so far as a list of (source, target) chess notation pairs"""
+        return [(SQUARE_NAMES[entry[0]], SQUARE_NAMES[entry[1]]) for entry in self._history]
+
     def get_turn(self):
         """Returns the player whose turn it is"""
         return self._turn
 
     def make_move(self, source, target):
-        """Moves the piece object located at source to the target on the board data member."""
-        # get board coordinates from the source and target strings
-        source_row = 0
-        source_col = 0
-        target_row = 0
-        target_col = 0
-        # getting the row index values for both source and target
-        for index, value in enumerate(self._rows):
-            if source[1] == value:
-                source_row = index
-            if target[1] == value:
-                target_row = index
-        # getting the column index values for both source and target
-        for index, value in enumerate(self._columns):
-            if source[0] == value:
-                source_col = index
-            if target[0] == value:
-                target_col = index
+        """
+        Moves the piece object located at source to the target on the board data member. Returns False without
+        changing anything if the move is illegal or either square isn't valid chess notation for a square on the board.
+        The work is split into the _parse_move(), _check_move() and _apply_move() stages, which instrument.py times.
+        """
+        move = self._parse_move(source, target)
+        if move is None:
+            return False
+        source_index, target_index = move
 
         # call validate_move() to determine if the inputted move is legal
-        if self.validate_move(self._board, source_row, source_col, target_row, target_col) is False:
+        if not self._check_move(source_index, target_index):
             return False
 
-        # the move is valid at this point, so create temporary variables and execute the move
-        origin_square = self._board[source_row][source_col]
-        destination_square = self._board[target_row][target_col]
-        # if the target square is empty, move the piece to the destination square and empty origin square
-        if destination_square is None:
-            self._board[target_row][target_col] = origin_square
-            self._board[source_row][source_col] = None
+        # the move is valid at this point, so execute it and return True to complete the move
+        self._apply_move(source_index, target_index)
+        return True
+
+    def _parse_move(self, source, target):
+        """
+        Helper method for make_move. Returns the (source, target) square indexes for two chess notation strings, or
+        None if either isn't a square on the board
+        """
+        # get the square indexes from the source and target strings with a single table lookup each
+        source_index = SQUARE_INDEX.get(source)
+        target_index = SQUARE_INDEX.get(target)
+        if source_index is None or target_index is None:
+            return None
+        return source_index, target_index
+
+    def _check_move(self, source, target):
+        """Helper method for make_move. Returns True if validate_move() accepts the move between two square indexes"""
+        return self.validate_move(self._board, source >> 3, source & 7, target >> 3, target & 7) is not False
+
+    def push_move(self, source, target):
+        """
+        Makes a move without validating it and records it so pop_move() can take it back. source and target are
+        row * 8 + col square indexes, as returned by generate_moves(). make_move() should be used for any move that
+        hasn't come from generate_moves().
+        """
+        # execute the move and keep whatever was on the destination square. the other backends do this in a single
+        # call, the list board is changed right here since this runs for every move searched
+        if self._engine is not None:
+            moving, destination_square = self._engine.move_piece(source, target)
+        else:
+            source_squares = self._board[source >> 3]
+            target_squares = self._board[target >> 3]
+            moving = source_squares[source & 7]
+            destination_square = target_squares[target & 7]
+            target_squares[target & 7] = moving
+            source_squares[source & 7] = None
+        self._history.append((source, target, destination_square, self._game_state, self._hash))
+        if self._attack_map is not None:
+            self._attack_map.touch(source, target)
+
+        # update the hash: the moving piece leaves source and lands on target, any captured piece leaves target and
+        # the turn passes to the other player
+        keys = PIECE_KEYS[moving.color_code][moving.type_code]
+        self._hash ^= keys[source] ^ keys[target] ^ BLACK_TO_MOVE
 
-        # else if the target square is occupied by an opposing piece (and is not empty), capture the piece
-        elif destination_square.get_color() != self._turn and destination_square is not None:
+        # if the target square was occupied by an opposing piece, take it off that player's count. only the captured
+        # piece's count changes, so it is the only one that needs checking for the win condition
+        if destination_square is not None:
+            self._piece_count -= 1
+            name = destination_square.get_name()
+            self._hash ^= PIECE_KEYS[destination_square.color_code][destination_square.type_code][target]
+            # if a piece in black's count dict is down to zero, white has won
             if self._turn == "WHITE":
-                for key in self._black_count:
-                    if key == destination_square.get_name():
-                        self._black_count[key] -= 1
+                self._black_count[name] -= 1
+                if self._black_count[name] == 0:
+                    self.set_game_state("WHITE_WON")
+            # if a piece in white's count dict is down to zero, black has won
             else:
-                for key in self._white_count:
-                    if key == destination_square.get_name():
-                        self._white_count[key] -= 1
-            self._board[target_row][target_col] = origin_square
-            self._board[source_row][source_col] = None
-
-        # update the game state if a player has won
-        # if a piece is white's count dict is down to zero, black has won
-        for value in self._white_count.values():
-            if value == 0:
-                self.set_game_state("BLACK_WON")
-        # if a piece in black's count dict is at zero, white has won
-        for value in self._black_count.values():
-            if value == 0:
-                self.set_game_state("WHITE_WON")
-
-        # update whose turn it is and return True to complete the move
+                self._white_count[name] -= 1
+                if self._white_count[name] == 0:
+                    self.set_game_state("BLACK_WON")
+
+        # update whose turn it is
         if self._turn == "WHITE":
             self._turn = "BLACK"
+            self._turn_code = BLACK
         else:
             self._turn = "WHITE"
+            self._turn_code = WHITE
+
+    # make_move()'s last stage, a separate name for the same method so instrument.py can time it without timing every
+    # push_move() made by the search
+    _apply_move = push_move
+
+    def pop_move(self):
+        """
+        Takes back the last move made by make_move() or push_move(), restoring the board, the captured piece's count,
+        the game state, the hash and the turn. Returns False if there is no move to take back.
+        """
+        if not self._history:
+            return False
+        source, target, captured, game_state, self._hash = self._history.pop()
+        # hand the turn back to the player who made the move
+        if self._turn == "WHITE":
+            self._turn = "BLACK"
+            self._turn_code = BLACK
+        else:
+            self._turn = "WHITE"
+            self._turn_code = WHITE
+        # the captured piece belongs to the other player, so it goes back onto their count
+        if captured is not None:
+            self._piece_count += 1
+            if self._turn == "WHITE":
+                self._black_count[captured.get_name()] += 1
+            else:
+                self._white_count[captured.get_name()] += 1
+        # move the piece back and put the captured piece, or None, back on the target square
+        if self._engine is not None:
+            self._engine.unmove_piece(source, target, captured)
+        else:
+            self._board[source >> 3][source & 7] = self._board[target >> 3][target & 7]
+            self._board[target >> 3][target & 7] = captured
+        if self._attack_map is not None:
+            self._attack_map.touch(source, target)
+        self._game_state = game_state
         return True
 
     def validate_move(self, board, source_row, source_col, target_row, target_col):
@@ -140,13 +303,18 @@ class ChessVar:
         * target_row, target_col: coordinates derived in make_move() from the inputted chess notation for a piece's
                                         finishing position
         """
+        # the bitboard backend checks piece ownership and the piece rules in a single pass over its masks
+        if self._engine is not None:
+            if self._game_state != "UNFINISHED":
+                return False
+            return self._engine.validate_move(self._turn_code, source_row, source_col, target_row, target_col)
         source_piece = self._board[source_row][source_col]
         target_piece = self._board[target_row][target_col]
         # if the piece on the starting square doesn't belong to the player whose turn it is, return False
-        if source_piece is not None and source_piece.get_color() != self._turn:
+        if source_piece is not None and source_piece.color_code != self._turn_code:
             return False
         # if the piece on the destination square is the same color as the player whose turn it is, return False
-        if target_piece is not None and target_piece.get_color() == self._turn:
+        if target_piece is not None and target_piece.color_code == self._turn_code:
             return False
         # if the game has already been won, return False
         elif self._game_state != "UNFINISHED":
@@ -157,8 +325,92 @@ class ChessVar:
             return False
         return True
 
+    def legal_moves(self):
+        """
+        Returns every move the player whose turn it is can make as a list of (source, target) chess notation pairs,
+        each of which make_move() would accept. Returns an empty list once the game has been won.
+        """
+        return [(SQUARE_NAMES[source], SQUARE_NAMES[target]) for source, target in self.generate_moves()]
+
+    def legal_moves_from(self, square):
+        """
+        Returns the moves the piece on square can make as (source, target) chess notation pairs. Returns an empty list
+        if the square is empty, holds an opposing piece, isn't on the board or the game has been won.
+        """
+        source = SQUARE_INDEX.get(square)
+        if source is None or self._game_state != "UNFINISHED":
+            return []
+        if self._engine is not None:
+            targets = [target for _, target in self._engine.generate_moves(self._turn_code, 1 << source)]
+        else:
+            targets = generate_square_moves(self._board, source, self._turn_code)
+        return [(square, SQUARE_NAMES[target]) for target in targets]
+
+    def best_move(self, time_ms=1000, max_depth=64):
+        """
+        Searches the current position for up to time_ms milliseconds and returns the best move found as a (source,
+        target) chess notation pair that can be passed to make_move(), or None if there is no move to make. The board
+        is left unchanged.
+        """
+        move = self.get_search_engine().search(self, time_ms, max_depth)[0]
+        if move is None:
+            return None
+        return SQUARE_NAMES[move[0]], SQUARE_NAMES[move[1]]
+
+    def get_search_engine(self):
+        """
+        Returns the SearchEngine used by best_move(), creating it on the first call. An opening book and endgame tables
+        are added to it with its set_book() and add_tablebase() methods.
+        """
+        if self._search_engine is None:
+            self._search_engine = SearchEngine()
+        return self._search_engine
+
+    def generate_moves(self):
+        """
+        Returns every legal move for the player whose turn it is as (source, target) pairs of row * 8 + col square
+        indexes. This skips the conversion to chess notation, so search code can pass the moves to push_move().
+        """
+        if self._game_state != "UNFINISHED":
+            return []
+        if self._engine is not None:
+            return self._engine.generate_moves(self._turn_code)
+        return generate_moves(self._board, self._turn_code)
+
+    def get_attacked_squares(self, color):
+        """
+        Returns the set of squares, in chess notation, that color's pieces attack: every square one of them could
+        capture on if an opposing piece stood there, whether or not one does. color is "WHITE" or "BLACK".
+        """
+        attack_map = self._refresh_attack_map()
+        return {SQUARE_NAMES[square] for square in attack_map.get_attacked(COLOR_CODES[color])}
+
+    def get_attackers(self, square):
+        """
+        Returns the squares, in chess notation, holding the pieces of either color that attack square. Returns an empty
+        list if square isn't valid chess notation.
+        """
+        index = SQUARE_INDEX.get(square)
+        if index is None:
+            return []
+        attack_map = self._refresh_attack_map()
+        return [SQUARE_NAMES[attacker] for attacker in sorted(attack_map.get_attackers(index))]
+
+    def _refresh_attack_map(self):
+        """Returns the AttackMap brought up to date with the board, creating it on the first call"""
+        if self._attack_map is None:
+            self._attack_map = AttackMap()
+        self._attack_map.refresh(self.get_piece)
+        return self._attack_map
+
+    def get_piece(self, row, col):
+        """Returns the Piece object on the given board coordinates, or None if the square is empty"""
+        if self._engine is not None:
+            return self._engine.piece_at(row, col)
+        return self._board[row][col]
+
     def display(self):
         """Prints the current state of the board."""
-        for index in self._board:
+        for index in self.get_board():
             print(index)
 
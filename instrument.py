@@ -0,0 +1,207 @@
+"""
+Optional instrumentation for the ChessVar move pipeline. Nothing here runs until enable() is called: enabling wraps
+the stage methods make_move() is built from and the per-piece validate_move() methods, and disable() puts the
+originals back, so a disabled process runs exactly the uninstrumented code. make_move() itself is never replaced, so
+the instrumented pipeline is always the real one.
+
+While enabled, every make_move() call is timed in four stages:
+* parse: ChessVar._parse_move(), converting the source and target notation to square indexes
+* validate: ChessVar._check_move(), which calls validate_move()
+* piece_rules: the per-piece validate_move() in subpieces.py, or the backend's equivalent, timed inside validate
+* apply: ChessVar._apply_move(), the push_move() that moves the piece and does the capture, count and win bookkeeping
+Each stage keeps a call count, total time and a histogram of call times in power of two nanosecond buckets. Calls
+and rejections are also counted per piece type, and rejections per reason.
+
+Results are polled with snapshot(), written as JSON with dump_json(), or pushed to a hook passed to enable() every
+export_every moves.
+"""
+import json
+import time
+
+from bitboard import BitBoard
+from game import ChessVar
+from mailbox_board import MailboxBoard
+from subpieces import King, Queen, Bishop, Knight, Rook, Pawn
+
+STAGES = ("parse", "validate", "piece_rules", "apply")
+PIECE_CLASSES = (King, Queen, Bishop, Knight, Rook, Pawn)
+ENGINE_CLASSES = (BitBoard, MailboxBoard)
+
+
+class Collector:
+    """
+    Holds the counters for one enabled period. Contains six data members:
+    * stages: for each stage name, a dict with "calls", "total_ns" and "histogram", which maps a bucket's upper bound
+                in nanoseconds (a power of two) to the number of calls that took at most that long
+    * pieces: for each piece name, a dict with "calls" and "rejections" for make_move() calls moving that piece type.
+                "NONE" counts moves from an empty or unreadable square
+    * reasons: the number of rejected make_move() calls for each rejection reason
+    * moves: the number of make_move() calls since the last export
+    * export_every, export_hook: the hook called with a snapshot every export_every moves, or None
+    """
+    def __init__(self, export_every=None, export_hook=None):
+        self._stages = {stage: {"calls": 0, "total_ns": 0, "histogram": {}} for stage in STAGES}
+        self._pieces = {}
+        self._reasons = {}
+        self._moves = 0
+        self._export_every = export_every
+        self._export_hook = export_hook
+
+    def time_stage(self, stage, elapsed_ns):
+        """Records one call of stage that took elapsed_ns nanoseconds"""
+        counters = self._stages[stage]
+        counters["calls"] += 1
+        counters["total_ns"] += elapsed_ns
+        bucket = 1 << elapsed_ns.bit_length()
+        counters["histogram"][bucket] = counters["histogram"].get(bucket, 0) + 1
+
+    def count_move(self, piece_name, reason=None):
+        """Records a make_move() call for piece_name, rejected for reason if reason isn't None"""
+        counters = self._pieces.get(piece_name)
+        if counters is None:
+            counters = self._pieces[piece_name] = {"calls": 0, "rejections": 0}
+        counters["calls"] += 1
+        if reason is not None:
+            counters["rejections"] += 1
+            self._reasons[reason] = self._reasons.get(reason, 0) + 1
+        self._moves += 1
+        if self._export_hook is not None and self._moves >= self._export_every:
+            self._moves = 0
+            self._export_hook(self.snapshot())
+
+    def snapshot(self):
+        """Returns a JSON serializable copy of every counter"""
+        return {
+            "stages": {stage: {"calls": counters["calls"], "total_ns": counters["total_ns"],
+                               "histogram": {str(bucket): calls for bucket, calls in
+                                             sorted(counters["histogram"].items())}}
+                       for stage, counters in self._stages.items()},
+            "pieces": {name: dict(counters) for name, counters in self._pieces.items()},
+            "rejections": dict(self._reasons)
+        }
+
+
+# the active Collector while enabled, and the original methods that were swapped out
+_collector = None
+_originals = {}
+
+
+def _rejection_reason(game, source_index, target_index):
+    """Works out why validate_move() turned down a move. Only called for rejected moves, so it can be slow"""
+    if game.get_game_state() != "UNFINISHED":
+        return "game over"
+    piece = game.get_piece(source_index >> 3, source_index & 7)
+    if piece is None:
+        return "empty square"
+    if piece.get_color() != game.get_turn():
+        return "opponent's piece"
+    target = game.get_piece(target_index >> 3, target_index & 7)
+    if target is not None and target.get_color() == game.get_turn():
+        return "own piece on target"
+    return "piece rule"
+
+
+def _piece_name(game, square):
+    """Returns the name of the piece on a square index, or "NONE" if it's empty"""
+    piece = game.get_piece(square >> 3, square & 7)
+    return piece.get_name() if piece is not None else "NONE"
+
+
+def _timed_parse(original):
+    """Wraps ChessVar._parse_move() so its calls are timed as the parse stage and bad notation is counted"""
+    def _parse_move(self, source, target):
+        start = time.perf_counter_ns()
+        move = original(self, source, target)
+        _collector.time_stage("parse", time.perf_counter_ns() - start)
+        if move is None:
+            _collector.count_move("NONE", "bad notation")
+        return move
+    _parse_move.__doc__ = original.__doc__
+    return _parse_move
+
+
+def _timed_check(original):
+    """Wraps ChessVar._check_move() so its calls are timed as the validate stage and rejections are counted"""
+    def _check_move(self, source, target):
+        start = time.perf_counter_ns()
+        valid = original(self, source, target)
+        _collector.time_stage("validate", time.perf_counter_ns() - start)
+        if not valid:
+            _collector.count_move(_piece_name(self, source), _rejection_reason(self, source, target))
+        return valid
+    _check_move.__doc__ = original.__doc__
+    return _check_move
+
+
+def _timed_apply(original):
+    """Wraps ChessVar._apply_move() so its calls are timed as the apply stage and the moved piece is counted"""
+    def _apply_move(self, source, target):
+        piece_name = _piece_name(self, source)
+        start = time.perf_counter_ns()
+        original(self, source, target)
+        _collector.time_stage("apply", time.perf_counter_ns() - start)
+        _collector.count_move(piece_name)
+    _apply_move.__doc__ = original.__doc__
+    return _apply_move
+
+
+# ChessVar's make_move() stage methods and the wrapper for each
+MOVE_STAGES = (("_parse_move", _timed_parse), ("_check_move", _timed_check), ("_apply_move", _timed_apply))
+
+
+def _timed_piece_rules(original):
+    """Wraps a piece or backend validate_move() so its calls are timed as the piece_rules stage"""
+    def validate_move(*args):
+        start = time.perf_counter_ns()
+        result = original(*args)
+        _collector.time_stage("piece_rules", time.perf_counter_ns() - start)
+        return result
+    validate_move.__doc__ = original.__doc__
+    return validate_move
+
+
+def enable(export_every=None, export_hook=None):
+    """
+    Starts collecting with fresh counters, replacing any earlier ones.
+    * export_every, export_hook: if given, export_hook is called with a snapshot() every export_every make_move() calls
+    """
+    global _collector
+    if export_hook is not None and not export_every:
+        raise ValueError("export_every must be a positive number of moves when an export hook is given")
+    if _collector is None:
+        for name, wrap in MOVE_STAGES:
+            _originals[name] = getattr(ChessVar, name)
+            setattr(ChessVar, name, wrap(_originals[name]))
+        for cls in PIECE_CLASSES + ENGINE_CLASSES:
+            _originals[cls] = cls.validate_move
+            cls.validate_move = _timed_piece_rules(cls.validate_move)
+    _collector = Collector(export_every, export_hook)
+
+
+def disable():
+    """Stops collecting and puts the original methods back. The counters from the enabled period are discarded"""
+    global _collector
+    if _collector is None:
+        return
+    for name, _ in MOVE_STAGES:
+        setattr(ChessVar, name, _originals.pop(name))
+    for cls in PIECE_CLASSES + ENGINE_CLASSES:
+        cls.validate_move = _originals.pop(cls)
+    _collector = None
+
+
+def is_enabled():
+    """Returns True while instrumentation is enabled"""
+    return _collector is not None
+
+
+def snapshot():
+    """Returns the current counters as a JSON serializable dict, or None if instrumentation isn't enabled"""
+    if _collector is None:
+        return None
+    return _collector.snapshot()
+
+
+def dump_json(file):
+    """Writes the current counters to a text file object as JSON"""
+    json.dump(snapshot(), file, indent=2)
@@ -0,0 +1,185 @@
+from array import array
+
+from subpieces import *
+from squares import TO_0X88, FROM_0X88
+
+
+# a square holds 0 when empty, type code + 1 for a white piece and -(type code + 1) for a black piece. PIECE_BY_CODE
+# is laid out so that indexing it with a square's value, negative values included, gives that square's shared Piece
+PIECE_BY_CODE = (None,) + PIECES[WHITE] + tuple(reversed(PIECES[BLACK]))
+
+# 0x88 steps. the difference between two 0x88 indexes identifies the direction between them without any wrapping
+KNIGHT_STEPS = (-33, -31, -18, -14, 14, 18, 31, 33)
+KING_STEPS = (-17, -16, -15, -1, 1, 15, 16, 17)
+ROOK_STEPS = (-16, -1, 1, 16)
+BISHOP_STEPS = (-17, -15, 15, 17)
+SLIDER_STEPS = (None, None, BISHOP_STEPS, ROOK_STEPS, ROOK_STEPS + BISHOP_STEPS, None)
+# white pawns move toward row 0, which is a negative step
+PAWN_PUSH = (-16, 16)
+PAWN_CAPTURES = ((-17, -15), (15, 17))
+START_ROW = (6, 1)
+ALL_SQUARES = (1 << 64) - 1
+
+
+def _build_step_table():
+    """
+    Returns a list indexed by target - source + 119 holding the step a rook or bishop would take to travel from source
+    to target, or 0 when the two squares don't share a line
+    """
+    table = [0] * 239
+    for step in ROOK_STEPS + BISHOP_STEPS:
+        for distance in range(1, 8):
+            table[step * distance + 119] = step
+    return table
+
+
+STEP_TABLE = _build_step_table()
+
+
+def piece_code(piece):
+    """Returns the signed square value for a Piece, or 0 for None"""
+    if piece is None:
+        return 0
+    if piece.color_code == WHITE:
+        return piece.type_code + 1
+    return -piece.type_code - 1
+
+
+class MailboxBoard:
+    """
+    Alternative board engine for ChessVar built on a flat 0x88 array. Each square is a signed byte, so off-board
+    detection is a single "index & 0x88" check and a ray is walked by adding a constant step. Takes and returns the same
+    row and column coordinates and row * 8 + col square indexes as BitBoard. Contains one data member:
+    * squares: an array('b') of 128 entries, of which the 64 with no 0x88 bit set are the board
+    """
+    def __init__(self):
+        self._squares = array("b", bytes(128))
+        for col, code in enumerate((4, 2, 3, 5, 6, 3, 2, 4)):
+            self._squares[col] = -code
+            self._squares[16 + col] = -1
+            self._squares[96 + col] = 1
+            self._squares[112 + col] = code
+
+    def load(self, board):
+        """Replaces the position with the pieces on a 2d array of Piece objects laid out like ChessVar's list board"""
+        self._squares = array("b", bytes(128))
+        for row in range(8):
+            for col in range(8):
+                self._squares[row * 16 + col] = piece_code(board[row][col])
+
+    def piece_at(self, row, col):
+        """Returns the Piece on the given coordinates, or None if the square is empty"""
+        return PIECE_BY_CODE[self._squares[row * 16 + col]]
+
+    def validate_move(self, turn, source_row, source_col, target_row, target_col):
+        """
+        Checks whether the player whose turn it is may move the piece on the source coordinates to the target
+        coordinates. The piece rules are the same as the validate_move() methods in subpieces.py.
+        * turn: the color code of the player whose turn it is
+        """
+        squares = self._squares
+        source = source_row * 16 + source_col
+        target = target_row * 16 + target_col
+        code = squares[source]
+        # the source square has to hold one of the moving player's pieces, the target square can't
+        if code == 0 or (code < 0) != (turn == BLACK):
+            return False
+        occupant = squares[target]
+        if occupant != 0 and (occupant < 0) == (code < 0):
+            return False
+        kind = abs(code) - 1
+        step = target - source
+        if kind == 1:
+            return step in KNIGHT_STEPS
+        if kind == 5:
+            return step in KING_STEPS
+        if kind == 0:
+            push = PAWN_PUSH[turn]
+            # diagonal captures need an opposing piece on the target square
+            if step in PAWN_CAPTURES[turn]:
+                return occupant != 0
+            if occupant != 0:
+                return False
+            # double move from the starting row, the square in between must also be empty
+            return step == push or (step == 2 * push and source_row == START_ROW[turn] and squares[source + push] == 0)
+        # rooks, bishops and queens walk their ray one step at a time until they reach the target
+        direction = STEP_TABLE[step + 119]
+        if direction == 0 or direction not in SLIDER_STEPS[kind]:
+            return False
+        square = source + direction
+        while square != target:
+            if squares[square] != 0:
+                return False
+            square += direction
+        return True
+
+    def generate_moves(self, color, sources=ALL_SQUARES):
+        """
+        Returns every legal move for the color index as (source, target) square index pairs. Only pieces standing on
+        the squares in the sources mask are considered.
+        """
+        squares = self._squares
+        moves = []
+        sign = -1 if color == BLACK else 1
+        for index in range(64):
+            if not sources >> index & 1:
+                continue
+            source = TO_0X88[index]
+            code = squares[source] * sign
+            # skip empty squares and the opponent's pieces, whose values have the other sign
+            if code <= 0:
+                continue
+            kind = code - 1
+            if kind == 0:
+                push = PAWN_PUSH[color]
+                target = source + push
+                if not target & 0x88 and squares[target] == 0:
+                    moves.append((index, FROM_0X88[target]))
+                    if source >> 4 == START_ROW[color] and squares[target + push] == 0:
+                        moves.append((index, FROM_0X88[target + push]))
+                for step in PAWN_CAPTURES[color]:
+                    target = source + step
+                    if not target & 0x88 and squares[target] * sign < 0:
+                        moves.append((index, FROM_0X88[target]))
+            elif kind == 1 or kind == 5:
+                for step in (KNIGHT_STEPS if kind == 1 else KING_STEPS):
+                    target = source + step
+                    if not target & 0x88 and squares[target] * sign <= 0:
+                        moves.append((index, FROM_0X88[target]))
+            else:
+                for step in SLIDER_STEPS[kind]:
+                    target = source + step
+                    while not target & 0x88:
+                        occupant = squares[target] * sign
+                        # own pieces block the ray, opposing pieces can be captured but block the rest of it
+                        if occupant > 0:
+                            break
+                        moves.append((index, FROM_0X88[target]))
+                        if occupant < 0:
+                            break
+                        target += step
+        return moves
+
+    def move_piece(self, source, target):
+        """
+        Moves the piece on source to target, both row * 8 + col square indexes, and returns (moving Piece, captured
+        Piece or None)
+        """
+        source = TO_0X88[source]
+        target = TO_0X88[target]
+        moving = self._squares[source]
+        captured = self._squares[target]
+        self._squares[target] = moving
+        self._squares[source] = 0
+        return PIECE_BY_CODE[moving], PIECE_BY_CODE[captured]
+
+    def unmove_piece(self, source, target, captured):
+        """Reverses move_piece(), moving the piece back to source and restoring the captured Piece on target"""
+        source = TO_0X88[source]
+        target = TO_0X88[target]
+        self._squares[source] = self._squares[target]
+        self._squares[target] = piece_code(captured)
+
+    def to_list(self):
+        """Builds a 2d list of Piece objects in the same layout as ChessVar's list board"""
+        return [[PIECE_BY_CODE[self._squares[row * 16 + col]] for col in range(8)] for row in range(8)]
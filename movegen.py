@@ -0,0 +1,93 @@
+from piece import WHITE
+from squares import DIRECTIONS, SLIDER_DIRECTIONS
+
+
+def _build_jump_squares(offsets):
+    """Returns a list of 64 tuples holding every on-board square reached from a square by one of the offsets"""
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        table.append(tuple((row + row_step) * 8 + col + col_step for row_step, col_step in offsets
+                           if 0 <= row + row_step < 8 and 0 <= col + col_step < 8))
+    return table
+
+
+def _build_ray_squares():
+    """Returns RAY_SQUARES[direction][square], the squares from square to the edge of the board, nearest first"""
+    rays = []
+    for row_step, col_step in DIRECTIONS:
+        table = []
+        for square in range(64):
+            row, col = divmod(square, 8)
+            ray = []
+            row, col = row + row_step, col + col_step
+            while 0 <= row < 8 and 0 <= col < 8:
+                ray.append(row * 8 + col)
+                row, col = row + row_step, col + col_step
+            table.append(tuple(ray))
+        rays.append(table)
+    return rays
+
+
+KNIGHT_JUMPS = _build_jump_squares(((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)))
+KING_JUMPS = _build_jump_squares(((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)))
+RAY_SQUARES = _build_ray_squares()
+
+
+def generate_square_moves(board, square, turn):
+    """
+    Returns the target squares the piece on square can legally move to on a 2d board of Piece objects. Squares are
+    indexed row * 8 + col. An empty square or a piece that doesn't belong to turn, a color code, has no moves.
+    """
+    piece = board[square >> 3][square & 7]
+    if piece is None or piece.color_code != turn:
+        return []
+    kind = piece.type_code
+    targets = []
+    if kind == 1 or kind == 5:
+        # knights and kings can land on any square that doesn't hold one of their own pieces
+        for target in (KNIGHT_JUMPS if kind == 1 else KING_JUMPS)[square]:
+            occupant = board[target >> 3][target & 7]
+            if occupant is None or occupant.color_code != turn:
+                targets.append(target)
+    elif kind == 0:
+        row, col = square >> 3, square & 7
+        # white pawns move up the board toward row 0, black pawns move down toward row 7
+        step, start_row = (-1, 6) if turn == WHITE else (1, 1)
+        next_row = row + step
+        if 0 <= next_row < 8:
+            # pushes need empty squares, the double move is only allowed from the starting row
+            if board[next_row][col] is None:
+                targets.append(next_row * 8 + col)
+                if row == start_row and board[next_row + step][col] is None:
+                    targets.append((next_row + step) * 8 + col)
+            # captures need an opposing piece diagonally forward
+            for capture_col in (col - 1, col + 1):
+                if 0 <= capture_col < 8:
+                    occupant = board[next_row][capture_col]
+                    if occupant is not None and occupant.color_code != turn:
+                        targets.append(next_row * 8 + capture_col)
+    else:
+        # sliders walk each ray until they run into a piece, which they can capture if it is an opposing one
+        for direction in SLIDER_DIRECTIONS[kind]:
+            for target in RAY_SQUARES[direction][square]:
+                occupant = board[target >> 3][target & 7]
+                if occupant is None:
+                    targets.append(target)
+                    continue
+                if occupant.color_code != turn:
+                    targets.append(target)
+                break
+    return targets
+
+
+def generate_moves(board, turn):
+    """
+    Returns every legal move for turn, a color code, on a 2d board of Piece objects as (source, target) square index
+    pairs
+    """
+    moves = []
+    for square in range(64):
+        for target in generate_square_moves(board, square, turn):
+            moves.append((square, target))
+    return moves
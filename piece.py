@@ -1,12 +1,44 @@
+# integer codes for the two colors and six piece types. the type codes match the order BitBoard indexes its masks by
+WHITE = 0
+BLACK = 1
+# the color and type names in code order, for tables indexed by color code or type code
+COLORS = ("WHITE", "BLACK")
+PIECE_TYPES = ("PAWN", "KNIGHT", "BISHOP", "ROOK", "QUEEN", "KING")
+COLOR_CODES = {"WHITE": WHITE, "BLACK": BLACK}
+TYPE_CODES = {name: code for code, name in enumerate(PIECE_TYPES)}
+
+
+def shared_piece(color_code, type_code):
+    """Returns the shared Piece instance for the given color and type codes"""
+    # imported here since subpieces.py builds on this module
+    from subpieces import PIECES
+    return PIECES[color_code][type_code]
+
+
 class Piece:
     """
     Represents a Piece object on the chess board. Contains color and name data members represented as strings
     and get methods from which the specific piece types will inherit. Rook, Bishop and Queen classes will utilize the
     specific validate methods.
+    Pieces are immutable and use __slots__, so a single shared instance per color and type (see PIECES in subpieces.py)
+    can stand on every square. The color_code and type_code attributes hold the integer codes for the color and name,
+    so hot paths can compare integers instead of calling get_color() and comparing strings.
     """
+    __slots__ = ("_color", "_name", "color_code", "type_code")
+
     def __init__(self, color, name):
-        self._color = color
-        self._name = name
+        object.__setattr__(self, "_color", color)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "color_code", COLOR_CODES[color])
+        object.__setattr__(self, "type_code", TYPE_CODES[name])
+
+    def __reduce__(self):
+        """Pickles and copies the piece as a reference to the shared instance for its color and type"""
+        return shared_piece, (self.color_code, self.type_code)
+
+    def __setattr__(self, key, value):
+        """Pieces are shared between squares and games, so they can't be changed once created"""
+        raise AttributeError("Piece objects are immutable")
 
     def get_color(self):
         """Return's the Piece's color"""
@@ -0,0 +1,182 @@
+"""
+Reads and writes ChessVar games in a PGN-like text format. Each game is a block of [Tag "value"] lines, a blank line,
+then the numbered moves in coordinate notation followed by the result, and a blank line:
+
+    [Game "1"]
+    [Result "1-0"]
+
+    1. e2e4 e7e5 2. d1h5 b8c6 ... 1-0
+
+Results use the PGN tokens "1-0" for WHITE_WON, "0-1" for BLACK_WON and "*" for an UNFINISHED game. The reader and
+writer work one game at a time, so files with millions of games never have to fit in memory.
+"""
+from game import ChessVar
+from squares import SQUARE_INDEX
+
+RESULT_TOKENS = {
+    "WHITE_WON": "1-0",
+    "BLACK_WON": "0-1",
+    "UNFINISHED": "*"
+}
+RESULT_STATES = {token: state for state, token in RESULT_TOKENS.items()}
+# movetext lines are wrapped at this width, as PGN does
+LINE_WIDTH = 79
+
+
+class GameRecord:
+    """
+    A game read from or written to a record file. Contains three data members:
+    * tags: a dict of the game's tag names and values, in file order
+    * moves: a list of (source, target) chess notation pairs
+    * result: the game state the game ended in, "UNFINISHED", "WHITE_WON" or "BLACK_WON"
+    """
+    def __init__(self, moves, result, tags=None):
+        self._moves = moves
+        self._result = result
+        self._tags = tags if tags is not None else {}
+
+    def get_tags(self):
+        """Returns the dict of tags"""
+        return self._tags
+
+    def get_moves(self):
+        """Returns the list of (source, target) moves"""
+        return self._moves
+
+    def get_result(self):
+        """Returns the game state the game ended in"""
+        return self._result
+
+
+class GameWriter:
+    """
+    Writes games to a text file object one at a time. Contains two data members:
+    * file: the file object the games are written to
+    * count: the number of games written so far, used for the default Game tag
+    """
+    def __init__(self, file):
+        self._file = file
+        self._count = 0
+
+    def get_count(self):
+        """Returns the number of games written so far"""
+        return self._count
+
+    def write_game(self, moves, result, tags=None):
+        """
+        Writes one game.
+        * moves: the (source, target) chess notation pairs in the order they were played
+        * result: the game state from get_game_state()
+        * tags: an optional dict of extra tags. a Game tag numbering the game and the Result tag are always written
+        """
+        self._count += 1
+        lines = ['[Game "%d"]' % self._count] if tags is None or "Game" not in tags else []
+        if tags is not None:
+            for name, value in tags.items():
+                if name != "Result":
+                    lines.append('[%s "%s"]' % (name, str(value).replace('"', "'")))
+        token = RESULT_TOKENS[result]
+        lines.append('[Result "%s"]' % token)
+        lines.append("")
+
+        # the movetext is numbered per pair of moves, white's first, and wrapped like PGN
+        line = ""
+        for index, (source, target) in enumerate(moves):
+            word = source + target
+            if index % 2 == 0:
+                word = "%d. %s" % (index // 2 + 1, word)
+            if line and len(line) + 1 + len(word) > LINE_WIDTH:
+                lines.append(line)
+                line = word
+            else:
+                line = line + " " + word if line else word
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+        lines.append(line)
+        lines.append("")
+        self._file.write("\n".join(lines) + "\n")
+
+    def write_chessvar(self, game, tags=None):
+        """Writes the moves played so far in a ChessVar along with its current game state"""
+        self.write_game(game.get_moves(), game.get_game_state(), tags)
+
+
+def read_games(file):
+    """
+    Generator that reads a record file object one line at a time and yields a GameRecord for each game in it. Raises
+    ValueError for a move that isn't two squares in coordinate notation.
+    """
+    tags = {}
+    moves = []
+    in_game = False
+    in_movetext = False
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("["):
+            # a tag line after movetext starts the next game, so the one before it was cut off before its result token
+            if in_movetext:
+                yield GameRecord(moves, "UNFINISHED", tags)
+                tags = {}
+                moves = []
+                in_movetext = False
+            # a tag line looks like [Name "value"]
+            name, _, value = line[1:-1].partition(" ")
+            tags[name] = value.strip('"')
+            in_game = True
+            continue
+        in_game = True
+        in_movetext = True
+        for token in line.split():
+            if token in RESULT_STATES:
+                # the result token ends the game's movetext
+                yield GameRecord(moves, RESULT_STATES[token], tags)
+                tags = {}
+                moves = []
+                in_game = False
+                in_movetext = False
+            elif token[-1] == ".":
+                continue
+            else:
+                source, target = token[:2], token[2:]
+                if source not in SQUARE_INDEX or target not in SQUARE_INDEX:
+                    raise ValueError("unreadable move in game record: " + token)
+                moves.append((source, target))
+    # a game cut off before its result token is returned as unfinished
+    if in_game:
+        yield GameRecord(moves, "UNFINISHED", tags)
+
+
+def write_games(file, records):
+    """Writes every GameRecord in the records iterable to a file object and returns the number written"""
+    writer = GameWriter(file)
+    for record in records:
+        writer.write_game(record.get_moves(), record.get_result(), record.get_tags())
+    return writer.get_count()
+
+
+def replay_game(record, trusted=False, backend="list"):
+    """
+    Plays a GameRecord's moves on a new ChessVar and returns it.
+    * trusted: if True the moves are applied with push_move(), skipping validate_move() entirely. Only use this for
+                records whose moves were already validated, such as games written from a ChessVar. Otherwise every move
+                goes through make_move(), and ValueError is raised for an illegal move or a result that doesn't match
+                the record
+    """
+    game = ChessVar(backend)
+    if trusted:
+        push_move = game.push_move
+        for source, target in record.get_moves():
+            push_move(SQUARE_INDEX[source], SQUARE_INDEX[target])
+        return game
+    for number, (source, target) in enumerate(record.get_moves(), 1):
+        if not game.make_move(source, target):
+            raise ValueError("illegal move %d in game record: %s%s" % (number, source, target))
+    if game.get_game_state() != record.get_result():
+        raise ValueError("game record result %s doesn't match the replayed game's %s"
+                         % (record.get_result(), game.get_game_state()))
+    return game
@@ -0,0 +1,369 @@
+"""
+Asyncio game server hosting many ChessVar games on a single event loop. Clients connect over a local TCP port, a unix
+socket or stdio and send one JSON object per line; every request gets one JSON object per line back, in order:
+
+    {"op": "new", "backend": "bitboard"}                      -> {"ok": true, "game": 1}
+    {"op": "move", "game": 1, "source": "e2", "target": "e4"} -> {"ok": true, "game": 1, ...state}
+    {"op": "state", "game": 1}                                -> {"ok": true, "game": 1, ...state}
+    {"op": "watch", "game": 1}                                -> {"ok": true, "game": 1}
+    {"op": "unwatch", "game": 1}                              -> {"ok": true, "game": 1}
+
+A move the game rejects gets {"ok": false, "error": "illegal move"}. Moves are applied with make_move(), so they're
+validated exactly as they would be locally.
+
+Watchers aren't sent every move as it happens. Games that changed are marked dirty and every broadcast_interval
+seconds each watcher gets a single {"op": "states", "games": [...]} message covering all of its games that changed,
+so a busy game costs one message per interval per watcher rather than one per move. Broadcasts never wait on a
+watcher: one that has stopped reading and has more than max_write_buffer bytes queued is disconnected.
+
+Games idle for longer than idle_timeout seconds, or the least recently used ones once there are more than max_active,
+are evicted from memory to a store of encoded move lists (two bytes per move, see archive.py). The store holds at most
+max_stored games, dropping the oldest beyond that. An evicted game is replayed from its moves the next time it's used.
+
+Run from the repository root with: python server.py [--port N | --unix PATH | --stdio]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from collections import OrderedDict
+
+from archive import encode_moves, decode_moves
+from game import ChessVar
+from records import GameRecord, replay_game
+
+
+def game_state(game_id, game):
+    """Returns the dict describing a game sent in responses and broadcasts"""
+    moves = game.get_moves()
+    return {
+        "game": game_id,
+        "turn": game.get_turn(),
+        "state": game.get_game_state(),
+        "moves": len(moves),
+        "last_move": "".join(moves[-1]) if moves else None
+    }
+
+
+class Session:
+    """
+    A game held in memory by the server. Contains three data members:
+    * game: the ChessVar being played
+    * backend: the board backend the game was created with, used when it's replayed after eviction
+    * last_active: the time.monotonic() time of the last request for the game
+    """
+    def __init__(self, game, backend):
+        self._game = game
+        self._backend = backend
+        self._last_active = time.monotonic()
+
+    def get_game(self):
+        """Returns the ChessVar being played and marks the session active"""
+        self._last_active = time.monotonic()
+        return self._game
+
+    def get_backend(self):
+        """Returns the board backend name"""
+        return self._backend
+
+    def get_last_active(self):
+        """Returns the time of the last request for the game"""
+        return self._last_active
+
+
+class GameServer:
+    """
+    Registry of games shared by every client connection. Contains nine data members:
+    * sessions: an OrderedDict of game id to Session for the games in memory, least recently used first
+    * stored: an OrderedDict of game id to (backend, encoded moves) for evicted games, oldest first
+    * watchers: a dict of game id to the set of StreamWriters watching the game
+    * dirty: a dict of game id to the game_state() dict of each watched game changed since the last broadcast
+    * ids: the iterator giving new game ids
+    * idle_timeout, max_active, max_stored: the eviction limits described in the module docstring
+    * broadcast_interval: the seconds between broadcasts to watchers
+    * max_write_buffer: the bytes a watcher may have queued before it's disconnected as too slow
+    """
+    def __init__(self, idle_timeout=300.0, max_active=10000, max_stored=100000, broadcast_interval=0.05,
+                 max_write_buffer=1 << 20):
+        self._sessions = OrderedDict()
+        self._stored = OrderedDict()
+        self._watchers = {}
+        self._dirty = {}
+        self._ids = itertools.count(1)
+        self._idle_timeout = idle_timeout
+        self._max_active = max_active
+        self._max_stored = max_stored
+        self._broadcast_interval = broadcast_interval
+        self._max_write_buffer = max_write_buffer
+
+    def get_active_count(self):
+        """Returns the number of games in memory"""
+        return len(self._sessions)
+
+    def get_stored_count(self):
+        """Returns the number of evicted games kept in the store"""
+        return len(self._stored)
+
+    def new_game(self, backend="list"):
+        """Creates a game and returns its id. Raises ValueError for an unknown backend"""
+        game_id = next(self._ids)
+        self._sessions[game_id] = Session(ChessVar(backend), backend)
+        if len(self._sessions) > self._max_active:
+            self.evict(next(iter(self._sessions)))
+        return game_id
+
+    def get_game(self, game_id):
+        """Returns the ChessVar for a game id, replaying it if it was evicted. Raises KeyError for an unknown id"""
+        session = self._sessions.get(game_id)
+        if session is not None:
+            self._sessions.move_to_end(game_id)
+            return session.get_game()
+
+        # replay an evicted game from its moves. they were validated when they were made, so it's done trusted
+        backend, data = self._stored.pop(game_id)
+        game = replay_game(GameRecord(decode_moves(data), None), True, backend)
+        self._sessions[game_id] = session = Session(game, backend)
+        if len(self._sessions) > self._max_active:
+            self.evict(next(iter(self._sessions)))
+        return session.get_game()
+
+    def make_move(self, game_id, source, target):
+        """
+        Plays a move in a game with make_move(). Returns its result and, if the game is watched, records its state for
+        the next broadcast so broadcasting never has to touch or replay the game
+        """
+        game = self.get_game(game_id)
+        if not game.make_move(source, target):
+            return False
+        if game_id in self._watchers:
+            self._dirty[game_id] = game_state(game_id, game)
+        return True
+
+    def evict(self, game_id):
+        """Moves a game from memory to the store, dropping the oldest stored game if the store is full"""
+        session = self._sessions.pop(game_id)
+        self._stored[game_id] = (session.get_backend(), encode_moves(session.get_game().get_moves()))
+        while len(self._stored) > self._max_stored:
+            dropped, _ = self._stored.popitem(last=False)
+            self._watchers.pop(dropped, None)
+            self._dirty.pop(dropped, None)
+
+    def evict_idle(self):
+        """Evicts every game idle for longer than idle_timeout and returns how many were evicted"""
+        deadline = time.monotonic() - self._idle_timeout
+        evicted = 0
+        # sessions are in least recently used order, so the idle ones are all at the front
+        while self._sessions:
+            game_id, session = next(iter(self._sessions.items()))
+            if session.get_last_active() > deadline:
+                break
+            self.evict(game_id)
+            evicted += 1
+        return evicted
+
+    def watch(self, game_id, writer):
+        """Adds writer to the watchers of a game. Raises KeyError if the game is unknown"""
+        if game_id not in self._sessions and game_id not in self._stored:
+            raise KeyError(game_id)
+        self._watchers.setdefault(game_id, set()).add(writer)
+
+    def unwatch(self, game_id, writer):
+        """Removes writer from the watchers of a game"""
+        writers = self._watchers.get(game_id)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self._watchers[game_id]
+
+    def drop_writer(self, writer):
+        """Removes writer from every game it watches, for when its connection closes"""
+        for game_id in [game_id for game_id, writers in self._watchers.items() if writer in writers]:
+            self.unwatch(game_id, writer)
+
+    def broadcast(self):
+        """
+        Queues one message for each watcher with the state of its games that changed, without waiting for any of them
+        to be sent. Watchers with more than max_write_buffer bytes still queued are disconnected instead. Returns the
+        writers sent to
+        """
+        if not self._dirty:
+            return []
+        batches = {}
+        for game_id, state in self._dirty.items():
+            for writer in self._watchers.get(game_id, ()):
+                batches.setdefault(writer, []).append(state)
+        self._dirty.clear()
+        sent = []
+        for writer, states in batches.items():
+            if writer.is_closing():
+                self.drop_writer(writer)
+            elif writer.transport.get_write_buffer_size() > self._max_write_buffer:
+                # a watcher that has stopped reading would otherwise queue states without limit
+                self.drop_writer(writer)
+                writer.close()
+            else:
+                writer.write((json.dumps({"op": "states", "games": states}) + "\n").encode())
+                sent.append(writer)
+        return sent
+
+    async def run_maintenance(self):
+        """Runs forever, broadcasting every broadcast_interval seconds and evicting idle games about once a second"""
+        last_eviction = time.monotonic()
+        while True:
+            await asyncio.sleep(self._broadcast_interval)
+            self.broadcast()
+            if time.monotonic() - last_eviction >= 1.0:
+                self.evict_idle()
+                last_eviction = time.monotonic()
+
+    def handle_request(self, request, writer):
+        """Carries out one decoded request for the connection with writer and returns the response dict"""
+        op = request.get("op")
+        try:
+            if op == "new":
+                return {"ok": True, "game": self.new_game(request.get("backend", "list"))}
+            game_id = request["game"]
+            if op == "move":
+                if not self.make_move(game_id, request["source"], request["target"]):
+                    return {"ok": False, "game": game_id, "error": "illegal move"}
+                response = game_state(game_id, self.get_game(game_id))
+            elif op == "state":
+                response = game_state(game_id, self.get_game(game_id))
+            elif op == "watch":
+                self.watch(game_id, writer)
+                response = {"game": game_id}
+            elif op == "unwatch":
+                self.unwatch(game_id, writer)
+                response = {"game": game_id}
+            else:
+                return {"ok": False, "error": "unknown op: %s" % op}
+        except KeyError as error:
+            return {"ok": False, "error": "missing or unknown %s" % error}
+        except (ValueError, TypeError) as error:
+            return {"ok": False, "error": str(error)}
+        response["ok"] = True
+        return response
+
+    async def handle_connection(self, reader, writer):
+        """Serves one client connection until it closes"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {"ok": False, "error": "invalid JSON"}
+                else:
+                    if isinstance(request, dict):
+                        response = self.handle_request(request, writer)
+                    else:
+                        response = {"ok": False, "error": "requests must be JSON objects"}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.drop_writer(writer)
+            writer.close()
+
+
+class StdinReader:
+    """
+    The parts of the asyncio.StreamReader interface the server uses, for when stdin is a regular file, which asyncio's
+    pipe transports refuse. Lines are read with blocking reads in the default executor. Contains one data member:
+    * file: the binary stdin file object
+    """
+    def __init__(self, file):
+        self._file = file
+
+    async def readline(self):
+        return await asyncio.get_running_loop().run_in_executor(None, self._file.readline)
+
+
+class StdoutWriter:
+    """
+    The parts of the asyncio.StreamWriter interface the server uses, writing to stdout. stdout may be a regular file,
+    which asyncio's pipe transports refuse, so writes are plain blocking writes flushed as they're made. Nothing is
+    ever left queued, so the writer is its own transport with an empty write buffer. Contains one data member:
+    * file: the binary stdout file object
+    """
+    def __init__(self, file):
+        self._file = file
+
+    @property
+    def transport(self):
+        return self
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def write(self, data):
+        self._file.write(data)
+        self._file.flush()
+
+    async def drain(self):
+        pass
+
+    def is_closing(self):
+        return self._file.closed
+
+    def close(self):
+        self._file.flush()
+
+
+async def serve_stdio(server):
+    """Serves a single client on stdin and stdout"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except ValueError:
+        # stdin is a regular file rather than a pipe, socket or terminal
+        reader = StdinReader(sys.stdin.buffer)
+    await server.handle_connection(reader, StdoutWriter(sys.stdout.buffer))
+
+
+async def serve(server, host="127.0.0.1", port=8765, unix_path=None, stdio=False):
+    """Runs server on stdio, a unix socket or a TCP port until cancelled or, for stdio, until stdin closes"""
+    maintenance = asyncio.create_task(server.run_maintenance())
+    try:
+        if stdio:
+            await serve_stdio(server)
+            return
+        if unix_path is not None:
+            listener = await asyncio.start_unix_server(server.handle_connection, unix_path)
+        else:
+            listener = await asyncio.start_server(server.handle_connection, host, port)
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        maintenance.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve many ChessVar games over a line based JSON protocol")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument("--unix", default=None, help="listen on this unix socket path instead of TCP")
+    parser.add_argument("--stdio", action="store_true", help="serve a single client on stdin and stdout")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="seconds before an idle game is evicted")
+    parser.add_argument("--max-active", type=int, default=10000, help="games kept in memory")
+    parser.add_argument("--max-stored", type=int, default=100000, help="evicted games kept in the store")
+    parser.add_argument("--broadcast-interval", type=float, default=0.05, help="seconds between broadcasts")
+    parser.add_argument("--max-write-buffer", type=int, default=1 << 20,
+                        help="bytes a watcher may have queued before it's disconnected")
+    args = parser.parse_args(argv)
+    server = GameServer(args.idle_timeout, args.max_active, args.max_stored, args.broadcast_interval,
+                        args.max_write_buffer)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix, args.stdio))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
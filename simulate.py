@@ -0,0 +1,119 @@
+"""
+Plays batches of ChessVar games across a pool of worker processes. Each game gets its own random number generator
+seeded from the batch seed and the game's index, so a batch gives the same games whatever the worker count or chunk
+size. Results stream back in game order as soon as each chunk finishes.
+
+Run from the repository root with, for example: python simulate.py --games 1000 --workers 8 > games.jsonl
+Pass --format pgn to write the games in the record format from records.py instead of JSON lines.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from game import ChessVar, BACKENDS
+from records import GameWriter
+from squares import SQUARE_NAMES
+
+
+def random_policy(game, rng, moves):
+    """Move policy that picks uniformly among the legal moves"""
+    return rng.choice(moves)
+
+
+def engine_policy(game, rng, moves, max_depth=2):
+    """
+    Move policy that plays the SearchEngine's choice at a fixed depth, searching the moves in an order shuffled with
+    rng so equally scored moves are picked at random and each seed gives its own game. No time limit is used so the
+    games stay reproducible.
+    """
+    moves = list(moves)
+    rng.shuffle(moves)
+    return game.get_search_engine().search(game, None, max_depth, moves)[0]
+
+
+POLICIES = {
+    "random": random_policy,
+    "engine": engine_policy
+}
+
+
+def game_seed(seed, index):
+    """Returns the seed for game index of a batch, derived from the batch seed"""
+    return "%d:%d" % (seed, index)
+
+
+def play_game(index, policy=random_policy, seed=0, backend="mailbox", max_moves=500):
+    """
+    Plays one game and returns its record as a dict with these keys:
+    * game: the game's index in the batch
+    * result: the game state from get_game_state(), "UNFINISHED" if max_moves ran out or the player to move had no moves
+    * moves: the number of moves played
+    * move_list: the moves as (source, target) chess notation pairs
+    policy is a function taking the ChessVar, a random.Random and the list of legal moves from generate_moves(), and
+    returning one of those moves. It has to be defined at module level so it can be sent to the worker processes.
+    """
+    rng = random.Random(game_seed(seed, index))
+    game = ChessVar(backend)
+    move_list = []
+    while game.get_game_state() == "UNFINISHED" and len(move_list) < max_moves:
+        # the moves are generated once per ply, and the one chosen came from generate_moves() so it needs no validating
+        moves = game.generate_moves()
+        if not moves:
+            break
+        source, target = policy(game, rng, moves)
+        game.push_move(source, target)
+        move_list.append((SQUARE_NAMES[source], SQUARE_NAMES[target]))
+    return {
+        "game": index,
+        "result": game.get_game_state(),
+        "moves": len(move_list),
+        "move_list": move_list
+    }
+
+
+def simulate_games(count, policy=random_policy, workers=None, chunk_size=16, seed=0, backend="mailbox",
+                   max_moves=500):
+    """
+    Generator that plays count games and yields each game's record from play_game() in game order.
+    * workers: the number of worker processes, defaults to one per CPU. with 1 the games are played in this process
+    * chunk_size: how many games are sent to a worker at a time. bigger chunks cut the messaging overhead, smaller
+                chunks balance the work better and stream results sooner
+    """
+    task = partial(play_game, policy=policy, seed=seed, backend=backend, max_moves=max_moves)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for index in range(count):
+            yield task(index)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for record in executor.map(task, range(count), chunksize=chunk_size):
+            yield record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a batch of ChessVar games and print them")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the CPU count")
+    parser.add_argument("--chunk-size", type=int, default=16, help="games sent to a worker at a time")
+    parser.add_argument("--seed", type=int, default=0, help="batch seed, the same seed replays the same games")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random", help="how moves are chosen")
+    parser.add_argument("--backend", choices=BACKENDS, default="mailbox", help="board backend")
+    parser.add_argument("--max-moves", type=int, default=500, help="moves after which a game is abandoned")
+    parser.add_argument("--format", choices=("jsonl", "pgn"), default="jsonl", help="output format")
+    args = parser.parse_args(argv)
+    writer = GameWriter(sys.stdout)
+    for record in simulate_games(args.games, POLICIES[args.policy], args.workers, args.chunk_size, args.seed,
+                                 args.backend, args.max_moves):
+        if args.format == "pgn":
+            writer.write_game(record["move_list"], record["result"], {"Seed": game_seed(args.seed, record["game"])})
+        else:
+            sys.stdout.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
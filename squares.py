@@ -0,0 +1,22 @@
+# the labels used in chess notation, in the order of ChessVar's board rows and columns
+ROWS = "87654321"
+COLUMNS = "abcdefgh"
+
+# SQUARE_NAMES[index] is the chess notation for the row * 8 + col square index and SQUARE_INDEX maps it back, so
+# parsing a square is a single dict lookup and anything that isn't a square on the board simply isn't found
+SQUARE_NAMES = tuple(COLUMNS[index & 7] + ROWS[index >> 3] for index in range(64))
+SQUARE_INDEX = {name: index for index, name in enumerate(SQUARE_NAMES)}
+
+# ray directions as (row step, column step). the first four are the rook directions and the last four are the bishop
+# directions
+DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1), (1, 1), (1, -1), (-1, -1), (-1, 1))
+ROOK_DIRECTIONS = (0, 1, 2, 3)
+BISHOP_DIRECTIONS = (4, 5, 6, 7)
+QUEEN_DIRECTIONS = (0, 1, 2, 3, 4, 5, 6, 7)
+# slider directions by type code, None for the pieces that don't slide
+SLIDER_DIRECTIONS = (None, None, BISHOP_DIRECTIONS, ROOK_DIRECTIONS, QUEEN_DIRECTIONS, None)
+
+# conversions between row * 8 + col indexes and 0x88 indexes (row * 16 + col), where any index with a bit of 0x88 set
+# is off the board
+TO_0X88 = tuple((index >> 3) * 16 + (index & 7) for index in range(64))
+FROM_0X88 = tuple((index >> 4) * 8 + (index & 7) if not index & 0x88 else -1 for index in range(128))
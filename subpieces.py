@@ -3,9 +3,11 @@ from piece import *
 
 class King(Piece):
     """Represents a King object on the chess board."""
+    __slots__ = ()
+
     def __repr__(self):
         """Return KW or KB for debugging"""
-        if self.get_color() == "WHITE":
+        if self.color_code == WHITE:
             return "KW"
         return "KB"
 
@@ -20,9 +22,11 @@ class King(Piece):
 
 class Queen(Piece):
     """Represents a Queen object on the chess board."""
+    __slots__ = ()
+
     def __repr__(self):
         """Return QW or QB for debugging"""
-        if self.get_color() == "WHITE":
+        if self.color_code == WHITE:
             return "QW"
         return "QB"
 
@@ -38,9 +42,11 @@ class Queen(Piece):
 
 class Bishop(Piece):
     """Represents a Bishop object on the chess board"""
+    __slots__ = ()
+
     def __repr__(self):
         """Return BW or BB for debugging"""
-        if self.get_color() == "WHITE":
+        if self.color_code == WHITE:
             return "BW"
         return "BB"
 
@@ -53,9 +59,11 @@ class Bishop(Piece):
 
 class Knight(Piece):
     """Represents a Knight object on the chess board."""
+    __slots__ = ()
+
     def __repr__(self):
         """Return NW or NB for debugging"""
-        if self.get_color() == "WHITE":
+        if self.color_code == WHITE:
             return "NW"
         return "NB"
 
@@ -72,9 +80,11 @@ class Knight(Piece):
 
 class Rook(Piece):
     """Represents a Rook object on the chess board."""
+    __slots__ = ()
+
     def __repr__(self):
         """Return RW or RB for debugging"""
-        if self.get_color() == "WHITE":
+        if self.color_code == WHITE:
             return "RW"
         return "RB"
 
@@ -91,9 +101,11 @@ class Rook(Piece):
 
 class Pawn(Piece):
     """Represents a Pawn object on the chess board."""
+    __slots__ = ()
+
     def __repr__(self):
         """Return PW or PB for debugging"""
-        if self.get_color() == "WHITE":
+        if self.color_code == WHITE:
             return "PW"
         return "PB"
 
@@ -103,20 +115,20 @@ class Pawn(Piece):
         separate checks for white and black in three different scenarios: diagonal capturing, first turn movement of one
         or two spaces and regular movement of one space.
         """
-        source_piece = board[source_row][source_col]
+        color = self.color_code
         target_piece = board[target_row][target_col]
         # capture check for white, if an opponent's piece is diagonally up and left or right one square return True
-        if target_row == source_row - 1 and abs(target_col-source_col) == 1 and source_piece.get_color() == "WHITE":
-            if target_piece is not None and source_piece.get_color() != target_piece.get_color():
+        if target_row == source_row - 1 and abs(target_col-source_col) == 1 and color == WHITE:
+            if target_piece is not None and color != target_piece.color_code:
                 return True
             return False
         # capture check for black, if an opponent's piece is diagonally down and left or right one square return True
-        elif target_row == source_row + 1 and abs(target_col-source_col) == 1 and source_piece.get_color() == "BLACK":
-            if target_piece is not None and source_piece.get_color() != target_piece.get_color():
+        elif target_row == source_row + 1 and abs(target_col-source_col) == 1 and color == BLACK:
+            if target_piece is not None and color != target_piece.color_code:
                 return True
             return False
         # double move check for white's first turn
-        elif source_row == 6 and source_piece.get_color() == "WHITE":
+        elif source_row == 6 and color == WHITE:
             if target_row == source_row-1 and target_col == source_col:
                 # check that the target square is empty to prevent the Pawn from capturing vertically
                 if target_piece is None:
@@ -130,7 +142,7 @@ class Pawn(Piece):
                     return False
             return False
         # double move check for black's first turn
-        elif source_row == 1 and source_piece.get_color() == "BLACK":
+        elif source_row == 1 and color == BLACK:
             if target_row == source_row+1 and target_col == source_col:
                 # check that the target square is empty to prevent the Pawn from capturing vertically
                 if target_piece is None:
@@ -144,16 +156,23 @@ class Pawn(Piece):
                     return False
             return False
         # regular movement vertically up one square for white
-        elif target_row == source_row - 1 and source_piece.get_color() == "WHITE":
+        elif target_row == source_row - 1 and target_col == source_col and color == WHITE:
             # prevent vertical capture
             if target_piece is None:
                 return True
             return False
         # regular movement vertically down one square for black
-        elif target_row == source_row + 1 and source_piece.get_color() == "BLACK":
+        elif target_row == source_row + 1 and target_col == source_col and color == BLACK:
             # prevent vertical capture
             if target_piece is None:
                 return True
             else:
                 return False
         return False
+
+
+# the shared piece instances, PIECES[color code][type code]. every square holding a white rook holds the same object
+PIECES = tuple(tuple(piece_class(color, name) for piece_class, name in
+                     ((Pawn, "PAWN"), (Knight, "KNIGHT"), (Bishop, "BISHOP"), (Rook, "ROOK"), (Queen, "QUEEN"),
+                      (King, "KING")))
+               for color in ("WHITE", "BLACK"))
@@ -0,0 +1,318 @@
+"""
+Endgame tables for ChessVar built by retrograde analysis. A table covers every placement of a fixed set of pieces,
+its material, with either player to move, and gives each position's result under this variant's rule that the game
+ends when a player loses the last piece of any type:
+* d > 0: the player to move wins in d plies, capturing the last of a type on ply d
+* d < 0: the player to move loses in -d plies against best play
+* 0: neither side can force a win, or the player to move has no moves
+Pieces of a type the material has more than one of can be captured without ending the game, so a table also covers
+the positions left after those captures.
+
+The generator walks every position once to count its moves and mark the immediate wins, then works backwards from
+the decided positions through their predecessors, breadth first, so each result gets the shortest win and the longest
+loss. Positions are indexed by the square of each piece (64 when captured) and the player to move, and the file is the
+header followed by one int16 result per index, so a Tablebase mmaps it and looks a position up with one read:
+
+    header:  b"CVTB", format version (uint16), piece count (uint16), then each piece's color code and type code (uint8)
+
+Tables only apply to positions whose pieces and count dicts match the material exactly. Games played from the start
+keep at least one piece of every type for each player until they end, so they never have fewer than twelve pieces on
+the board and never reach a table: tables are for analysing positions set up with set_position() and explicit
+counts, such as endgame studies. Everything is built in Python, so tables are practical for up to three pieces.
+
+Build one from the repository root with: python tablebase.py --material Kkr --output kkr.bin
+"""
+import argparse
+import itertools
+import mmap
+import struct
+from array import array
+from collections import deque
+
+from movegen import generate_square_moves
+from piece import TYPE_CODES
+from subpieces import PIECES
+
+MAGIC = b"CVTB"
+VERSION = 1
+# the square index meaning a piece has been captured
+CAPTURED = 64
+# material letters, as in the benchmarks' board layouts: PNBRQK for white pieces and pnbrqk for black ones
+LETTERS = "pnbrqk"
+
+_HEADER = struct.Struct("<4sHH")
+
+
+def parse_material(text):
+    """Returns the sorted tuple of (color code, type code) pieces for a material string such as "Kkr" """
+    material = []
+    for letter in text:
+        if letter.lower() not in LETTERS:
+            raise ValueError("unknown piece letter in material: " + letter)
+        material.append((0 if letter.isupper() else 1, LETTERS.index(letter.lower())))
+    return tuple(sorted(material))
+
+
+def _position_index(squares, turn):
+    """
+    Returns the table index of the position with the pieces on squares, a sequence in material order. The first
+    piece's square is the most significant digit, so itertools.product() walks the positions in index order
+    """
+    index = 0
+    for square in squares:
+        index = index * 65 + square
+    return index * 2 + turn
+
+
+def _last_of_kind(material, squares, piece):
+    """Returns True if piece is the only one of its color and type still on the board"""
+    for other, square in enumerate(squares):
+        if other != piece and square != CAPTURED and material[other] == material[piece]:
+            return False
+    return True
+
+
+def _is_valid(material, squares):
+    """Returns True if no two pieces share a square and every captured piece left another of its kind behind"""
+    placed = [square for square in squares if square != CAPTURED]
+    if len(set(placed)) != len(placed):
+        return False
+    for piece, square in enumerate(squares):
+        if square == CAPTURED:
+            if all(squares[other] == CAPTURED for other in range(len(material))
+                   if material[other] == material[piece]):
+                return False
+    return True
+
+
+def generate_table(material):
+    """
+    Solves every position of material, a tuple from parse_material(), and returns the array('h') of results indexed
+    as described in the module docstring
+    """
+    size = 2 * 65 ** len(material)
+    weights = [65 ** (len(material) - 1 - piece) for piece in range(len(material))]
+    results = array("h", [0]) * size
+    move_counts = array("H", [0]) * size
+    # successors of every position, stored back to back with starts[index] marking where each position's begin
+    successors = array("l")
+    starts = array("l", [0]) * (size + 1)
+    queue = deque()
+    board = [[None] * 8 for _ in range(8)]
+
+    for squares in itertools.product(range(65), repeat=len(material)):
+        index = _position_index(squares, 0)
+        valid = _is_valid(material, squares)
+        for turn in (0, 1):
+            starts[index + turn] = len(successors)
+            if not valid:
+                continue
+            occupant = {square: piece for piece, square in enumerate(squares) if square != CAPTURED}
+            for square, piece in occupant.items():
+                color, kind = material[piece]
+                board[square >> 3][square & 7] = PIECES[color][kind]
+            won = False
+            for piece, square in enumerate(squares):
+                if square == CAPTURED or material[piece][0] != turn:
+                    continue
+                for target in generate_square_moves(board, square, turn):
+                    successor = index - 2 * square * weights[piece] + 2 * target * weights[piece]
+                    captured = occupant.get(target)
+                    if captured is not None:
+                        # taking the last piece of a type wins on the spot
+                        if _last_of_kind(material, squares, captured):
+                            won = True
+                            break
+                        successor += 2 * (CAPTURED - target) * weights[captured]
+                    successors.append(successor + 1 - turn)
+                if won:
+                    break
+            for square in occupant:
+                board[square >> 3][square & 7] = None
+            if won:
+                results[index + turn] = 1
+                queue.append(index + turn)
+                del successors[starts[index + turn]:]
+            else:
+                move_counts[index + turn] = len(successors) - starts[index + turn]
+    starts[size] = len(successors)
+
+    # invert the successor lists into predecessor lists, in the same layout
+    predecessor_starts = array("l", [0]) * (size + 1)
+    for successor in successors:
+        predecessor_starts[successor + 1] += 1
+    for index in range(size):
+        predecessor_starts[index + 1] += predecessor_starts[index]
+    predecessors = array("l", [0]) * len(successors)
+    fill = array("l", predecessor_starts)
+    for index in range(size):
+        for position in range(starts[index], starts[index + 1]):
+            successor = successors[position]
+            predecessors[fill[successor]] = index
+            fill[successor] += 1
+    del successors, starts, fill
+
+    # breadth first from the decided positions. a position one move from a lost one is won, and a position whose
+    # every move leads to a won one is lost, taking the distance from the last of those to be decided
+    while queue:
+        index = queue.popleft()
+        result = results[index]
+        for position in range(predecessor_starts[index], predecessor_starts[index + 1]):
+            predecessor = predecessors[position]
+            if results[predecessor] != 0:
+                continue
+            if result < 0:
+                results[predecessor] = 1 - result
+                queue.append(predecessor)
+            else:
+                move_counts[predecessor] -= 1
+                if move_counts[predecessor] == 0:
+                    results[predecessor] = -result - 1
+                    queue.append(predecessor)
+    return results
+
+
+def write_table(file, material, results):
+    """Writes a table from generate_table() to a binary file object"""
+    file.write(_HEADER.pack(MAGIC, VERSION, len(material)))
+    file.write(bytes(value for piece in material for value in piece))
+    file.write(results.tobytes())
+    file.flush()
+
+
+class Tablebase:
+    """
+    Reads a table file through mmap and looks ChessVar positions up in it. Contains four data members:
+    * file: the open table file
+    * map: the read-only mmap of the whole file
+    * material: the sorted tuple of (color code, type code) pieces the table covers
+    * offset: where the results start in the file
+    """
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can't be mapped
+            self._file.close()
+            raise ValueError("not a ChessVar endgame table: " + str(path)) from None
+        valid = len(self._map) >= _HEADER.size
+        if valid:
+            magic, version, count = _HEADER.unpack_from(self._map, 0)
+            self._offset = _HEADER.size + 2 * count
+            # one int16 result per piece placement and player to move
+            valid = (magic == MAGIC and version == VERSION and
+                     len(self._map) == self._offset + 2 * 2 * 65 ** count)
+        if not valid:
+            self.close()
+            raise ValueError("not a ChessVar endgame table: " + str(path))
+        data = self._map[_HEADER.size:self._offset]
+        self._material = tuple((data[piece], data[piece + 1]) for piece in range(0, 2 * count, 2))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_material(self):
+        """Returns the sorted tuple of (color code, type code) pieces the table covers"""
+        return self._material
+
+    def _index(self, game):
+        """Returns the table index of a ChessVar's position, or None if the table doesn't cover it"""
+        # any position from a game played from the start has too many pieces, so it's turned away without a scan
+        if game.get_piece_count() > len(self._material) or game.get_game_state() != "UNFINISHED":
+            return None
+        # give each piece on the board the first unused material slot of its kind
+        squares = [CAPTURED] * len(self._material)
+        for square in range(64):
+            piece = game.get_piece(square >> 3, square & 7)
+            if piece is None:
+                continue
+            kind = (piece.color_code, piece.type_code)
+            for slot, material_kind in enumerate(self._material):
+                if material_kind == kind and squares[slot] == CAPTURED:
+                    squares[slot] = square
+                    break
+            else:
+                return None
+        # the counts have to agree with the board for the table's idea of which capture ends the game to hold. kinds
+        # missing from the material never get captured, so their counts only need to keep the game going
+        counts = (game.get_white_count(), game.get_black_count())
+        for color in (0, 1):
+            for name, remaining in counts[color].items():
+                kind = (color, TYPE_CODES[name])
+                on_board = sum(1 for slot, square in enumerate(squares)
+                               if square != CAPTURED and self._material[slot] == kind)
+                if kind in self._material:
+                    if remaining != on_board:
+                        return None
+                elif remaining < 1:
+                    return None
+        return _position_index(squares, 0 if game.get_turn() == "WHITE" else 1)
+
+    def probe(self, game):
+        """Returns the result of a ChessVar's position as described in the module docstring, or None if not covered"""
+        index = self._index(game)
+        if index is None:
+            return None
+        return struct.unpack_from("<h", self._map, self._offset + 2 * index)[0]
+
+    def get_move(self, game):
+        """
+        Returns (move, result) for a ChessVar's position, move being the best (source, target) square index pair by
+        the table: the quickest win, otherwise a move holding the draw, otherwise the slowest loss. Returns None if the
+        table doesn't cover the position or the player to move has no moves.
+        """
+        result = self.probe(game)
+        if result is None:
+            return None
+        best_move = None
+        best_rank = None
+        for move in game.generate_moves():
+            game.push_move(*move)
+            try:
+                if game.get_game_state() != "UNFINISHED":
+                    rank = (3, 0)
+                else:
+                    reply = self.probe(game)
+                    # the reply's result is from the opponent's side, so lower is better for the player moving
+                    if reply < 0:
+                        rank = (2, reply)
+                    elif reply == 0:
+                        rank = (1, 0)
+                    else:
+                        rank = (0, reply)
+            finally:
+                game.pop_move()
+            if best_rank is None or rank > best_rank:
+                best_rank = rank
+                best_move = move
+        if best_move is None:
+            return None
+        return best_move, result
+
+    def close(self):
+        """Unmaps and closes the table file"""
+        self._map.close()
+        self._file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a ChessVar endgame table by retrograde analysis")
+    parser.add_argument("--material", required=True, help="pieces on the board, PNBRQK for white and pnbrqk for black")
+    parser.add_argument("--output", required=True, help="table file to write")
+    args = parser.parse_args(argv)
+    material = parse_material(args.material)
+    results = generate_table(material)
+    with open(args.output, "wb") as file:
+        write_table(file, material, results)
+    wins = sum(1 for result in results if result > 0)
+    losses = sum(1 for result in results if result < 0)
+    print("%d positions won, %d lost, longest win %d plies, written to %s"
+          % (wins, losses, max(results), args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bound flags stored with search results
+EXACT = "EXACT"
+LOWER_BOUND = "LOWER_BOUND"
+UPPER_BOUND = "UPPER_BOUND"
+
+# replacement policies for when two positions map to the same slot
+ALWAYS_REPLACE = "ALWAYS"
+DEPTH_PREFERRED = "DEPTH"
+
+
+class TranspositionTable:
+    """
+    Caches results for positions keyed by their Zobrist hash, using a fixed number of slots so memory use is bounded.
+    A position's slot is its hash modulo the table size. Contains five data members:
+    * size: the number of slots
+    * policy: ALWAYS_REPLACE to let a new entry overwrite whatever is in its slot, or DEPTH_PREFERRED to keep the old
+                entry when it came from a deeper search than the new one
+    * slots: a list of (key, depth, value, flag, move) entries, or None for empty slots
+    * hits, misses: the number of probes that did and didn't find their position
+    """
+    def __init__(self, size=1 << 16, policy=DEPTH_PREFERRED):
+        if size < 1:
+            raise ValueError("transposition table size must be at least 1")
+        if policy not in (ALWAYS_REPLACE, DEPTH_PREFERRED):
+            raise ValueError("unknown replacement policy: " + str(policy))
+        self._size = size
+        self._policy = policy
+        self._slots = [None] * size
+        self._hits = 0
+        self._misses = 0
+
+    def get_size(self):
+        """Returns the number of slots in the table"""
+        return self._size
+
+    def get_hits(self):
+        """Returns the number of successful probes"""
+        return self._hits
+
+    def get_misses(self):
+        """Returns the number of probes that didn't find their position"""
+        return self._misses
+
+    def probe(self, key):
+        """Returns the (depth, value, flag, move) stored for the position with hash key, or None if it isn't cached"""
+        entry = self._slots[key % self._size]
+        if entry is None or entry[0] != key:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return entry[1:]
+
+    def store(self, key, value, depth=0, flag=EXACT, move=None):
+        """
+        Caches a result for the position with hash key, subject to the replacement policy.
+        * value: whatever is being cached, such as a legal move list, an evaluation or a search score
+        * depth: how many plies deep the search behind value went, 0 for results that don't come from a search
+        * flag: EXACT, LOWER_BOUND or UPPER_BOUND, telling a search how to use value
+        * move: the best move found for the position, or None
+        Returns False if the policy kept the entry already in the slot.
+        """
+        index = key % self._size
+        entry = self._slots[index]
+        # with depth preferred replacement a shallower result for a different position doesn't evict a deeper one
+        if self._policy == DEPTH_PREFERRED and entry is not None and entry[0] != key and entry[1] > depth:
+            return False
+        self._slots[index] = (key, depth, value, flag, move)
+        return True
+
+    def clear(self):
+        """Empties every slot and resets the hit and miss counters"""
+        self._slots = [None] * self._size
+        self._hits = 0
+        self._misses = 0
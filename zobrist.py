@@ -0,0 +1,30 @@
+import random
+
+from piece import COLORS, PIECE_TYPES
+
+
+# a fixed seed keeps the keys, and so every position's hash, the same across processes and runs
+_rng = random.Random(0x5EED)
+
+# PIECE_KEYS[color code][type code][square] is the random 64-bit key for that piece standing on that square
+PIECE_KEYS = tuple(tuple(tuple(_rng.getrandbits(64) for _ in range(64)) for _ in PIECE_TYPES) for _ in COLORS)
+# mixed into the hash whenever it is black's turn
+BLACK_TO_MOVE = _rng.getrandbits(64)
+
+
+def compute_hash(board, turn):
+    """
+    Computes the Zobrist hash of a position from scratch. ChessVar keeps its hash up to date incrementally, this is
+    for building the starting hash and for checking the incremental one.
+    * board: a 2d array of Piece objects, as returned by ChessVar.get_board()
+    * turn: "WHITE" or "BLACK"
+    """
+    key = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece is not None:
+                key ^= PIECE_KEYS[piece.color_code][piece.type_code][row * 8 + col]
+    if turn == "BLACK":
+        key ^= BLACK_TO_MOVE
+    return key